@@ -1,7 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: UTF-8 -*-
 
+import collections
 import itertools
+import multiprocessing
+import sys
+import weakref
+
+try:
+	import numpy
+except ImportError:
+	numpy=None
 
 """crom.py: Proof of concept implementation of the formal role-based modeling language CROM."""
 
@@ -20,21 +29,72 @@ def mutual_disjoint(sets):
 			a.add(x)
 	return True
 
+def satisfied(violations):
+	'''
+	Returns true iff the given iterable of violations is empty.
+	'''
+	for v in violations:
+		return False
+	return True
+
 def total_function(domain, foo):
 	d=frozenset(domain)
 	f=set(iter(foo))
 	return d <= f
 
 
+def successors(a):
+	'''
+	Returns the adjacency sets of the given binary relation.
+	'''
+	s = dict()
+	for x,y in a:
+		s.setdefault(x,set()).add(y)
+	return s
+
+def reachable(s,x):
+	'''
+	Returns the elements reachable from x by a non-empty path in the adjacency sets s.
+	'''
+	seen = set()
+	stack = list(s.get(x,()))
+	while stack:
+		y = stack.pop()
+		if y not in seen:
+			seen.add(y)
+			stack.extend(s.get(y,()))
+	return seen
+
 def transitive_closure(a):
-	c = set(a)
-	while True:
-		n = set((x,z) for x,y in c for q,z in c if q == y)
-		cn = c | n
-		if cn == c:
-			break
-		c = cn
-	return c
+	s = successors(a)
+	return set((x,y) for x in s for y in reachable(s,x))
+
+def has_cycle(a):
+	'''
+	Returns true iff the given binary relation contains a cycle (including self-loops),
+	using an iterative depth-first search in O(|a|).
+	'''
+	s = successors(a)
+	done = set()
+	for x in s:
+		if x in done:
+			continue
+		path = set([x])
+		stack = [(x,iter(s[x]))]
+		while stack:
+			y,it = stack[-1]
+			for z in it:
+				if z in path:
+					return True
+				if z not in done:
+					path.add(z)
+					stack.append((z,iter(s.get(z,()))))
+					break
+			else:
+				stack.pop()
+				path.discard(y)
+				done.add(y)
+	return False
 
 # Defintion of Compartment Role Object Models
 
@@ -43,9 +103,10 @@ class CROM:
 	Class representation of a Compartment Role Object Model (CROM).
 	'''
   
-	def __init__(self,nt,rt,ct,rst,fills,rel):
+	def __init__(self,nt,rt,ct,rst,fills,rel,check=True):
 		'''
 		Creates a new CROM instances from the sets of naturel types, role types, compartment types, relationship types, fulfillments, and relationship mappings.
+		For trusted bulk loads the structural checks can be skipped (check=False) and performed later by calling check().
 		'''
 		self.nt=frozenset(nt)
 		self.rt=frozenset(rt)
@@ -53,10 +114,40 @@ class CROM:
 		self.rst=frozenset(rst)
 		self.fills=frozenset(fills)
 		self.rel=dict(rel)
+		if check:
+			self.check()
+		self.index()
+		self.verdicts=dict()
+
+	def invalidate(self):
+		'''
+		Rebuilds the indexes and drops the cached verdicts, e.g., after the CROM was modified.
+		'''
+		self.index()
+		self.verdicts.clear()
+
+	def index(self):
+		'''
+		(Re)builds the indexes over the fulfillments, i.e.,
+		role type -> {fills}, compartment type -> {fills}, and (compartment type,role type) -> {fills}.
+		'''
+		self.fills_by_rt=dict()
+		self.fills_by_ct=dict()
+		self.fills_by_ctrt=dict()
+		for f in self.fills:
+			self.fills_by_rt.setdefault(f[2],set()).add(f)
+			self.fills_by_ct.setdefault(f[1],set()).add(f)
+			self.fills_by_ctrt.setdefault((f[1],f[2]),set()).add(f)
+
+	def check(self):
+		'''
+		Asserts that the sets are mutual disjoint and that fills and rel range over the given types.
+		Each tuple is checked componentwise, i.e., without materializing the cartesian products.
+		'''
 		assert mutual_disjoint([self.nt,self.rt,self.ct,self.rst])
-		assert self.fills <= set(itertools.product((self.nt | self.ct),self.ct,self.rt))
-		assert set(self.rel.iterkeys()) <= set(itertools.product(self.rst,self.ct))
-		assert set(self.rel.itervalues()) <= set(itertools.product(self.rt,self.rt))
+		assert all( (t in self.nt or t in self.ct) and ct in self.ct and rt in self.rt for (t,ct,rt) in self.fills )
+		assert all( rst in self.rst and ct in self.ct for (rst,ct) in self.rel.iterkeys() )
+		assert all( rt_1 in self.rt and rt_2 in self.rt for (rt_1,rt_2) in self.rel.itervalues() )
 		
 	def __str__(self):
 		'''
@@ -67,54 +158,93 @@ class CROM:
 	def wellformed(self):
 		'''
 		Returns true iff CROM is well-formed. 
+		The verdict is cached in verdicts['wellformed'] until invalidate() is called.
 		'''
-		return self.axiom1() and self.axiom2() and self.axiom3() and \
-		self.axiom4() and self.axiom5()
+		if 'wellformed' not in self.verdicts:
+			self.verdicts['wellformed']=self.axiom1() and self.axiom2() and self.axiom3() and \
+			self.axiom4() and self.axiom5()
+		return self.verdicts['wellformed']
 		
 	def axiom1(crom):
 		'''
 		\\forall rt \\in RT \\exists! ct \\in CT \\exists t \\in (NT \\cup CT) : (t,ct,rt) \\in \\text{fills}
 		'''
-		return all( len( set([ ct for ct in crom.ct for t in (crom.nt | crom.ct) if (t,ct,rt) in crom.fills ]) )==1 for rt in crom.rt)
-		
+		return satisfied(crom.violations1())
+
+	def violations1(crom):
+		'''
+		Yields the role types violating axiom1 together with the compartment types they are contained in, i.e., (rt,{ct}).
+		'''
+		for rt in crom.rt:
+			cts=set([ ct for (t,ct,_) in crom.fills_by_rt.get(rt,()) \
+			if (t in crom.nt or t in crom.ct) and ct in crom.ct ])
+			if len(cts)!=1:
+				yield (rt,cts)
+
 	def axiom2(crom):
 		'''
 		\\forall ct \\in CT \\exists (t,ct,rt) \\in \\text{fills}
 		'''
-		return all( any( f[1]==ct for f in crom.fills )  for ct in crom.ct ) 
-		
+		return satisfied(crom.violations2())
+
+	def violations2(crom):
+		'''
+		Yields the compartment types violating axiom2.
+		'''
+		return ( ct for ct in crom.ct if ct not in crom.fills_by_ct )
+
 	def axiom3(crom):
 		'''
 		\\forall rst \\in RST \\exists ct \\in CT : (rst,ct) \\in \\textbf{domain}(rel)
 		'''
-		return all( any( (rst,ct) in crom.rel.keys() for ct in crom.ct ) for rst in crom.rst ) 
-		
+		return satisfied(crom.violations3())
+
+	def violations3(crom):
+		'''
+		Yields the relationship types violating axiom3.
+		'''
+		domain=set( rst for (rst,ct) in crom.rel.iterkeys() if ct in crom.ct )
+		return ( rst for rst in crom.rst if rst not in domain )
+
 	def axiom4(crom):
 		'''
 		\\forall (rt_1,rt_2) \\in \\mathbf{codomain}(\\text{rel})\\!: rt_1 \\neq rt_2
 		'''
-		return all( rt_1 != rt_2 for (rt_1,rt_2) in crom.rel.values() ) 
-		
+		return satisfied(crom.violations4())
+
+	def violations4(crom):
+		'''
+		Yields the entries ((rst,ct),(rt_1,rt_2)) of rel violating axiom4.
+		'''
+		return ( ((rst,ct),(rt_1,rt_2)) for (rst,ct),(rt_1,rt_2) in crom.rel.iteritems() if rt_1 == rt_2 )
+
 	def axiom5(crom):
 		'''
 		\\forall (rst,ct) \\in \\mathbf{domain}(\\text{rel}) :
 		\\text{rel}(rst,ct) = (rt_1,rt_2)\\ \\wedge (\\_,ct,rt_1),(\\_,ct,rt_2) \\in \\text{fills}
 		'''
-		return all( any( (t,ct,rt) in crom.fills for t in (crom.nt|crom.ct) ) \
-		for (rst,ct) in crom.rel.keys() for rt in crom.rel[(rst,ct)] ) 
-		
+		return satisfied(crom.violations5())
+
+	def violations5(crom):
+		'''
+		Yields the pairs ((rst,ct),rt) violating axiom5, i.e., where rt is not filled in ct.
+		'''
+		return ( ((rst,ct),rt) for (rst,ct) in crom.rel.iterkeys() for rt in crom.rel[(rst,ct)] \
+		if not any( t in crom.nt or t in crom.ct for (t,_,_) in crom.fills_by_ctrt.get((ct,rt),()) ) )
+
 	def parts(self,ct):
-		return set( rt for (t,ct_1,rt) in self.fills if ct_1==ct )
+		return set( rt for (t,ct_1,rt) in self.fills_by_ct.get(ct,()) )
 
 class CROI:
 	'''
 	Class representation of the Compartment Role Object Instance (CROI).
 	'''
 
-	def __init__(self,n,r,c,type1,plays,links):
+	def __init__(self,n,r,c,type1,plays,links,check=True):
 		'''
 		Creates a new CROI from the given sets of naturals, roles, compartments;
 		the type mapping; the plays-relation; and links-function.
+		For trusted bulk loads the structural checks can be skipped (check=False) and performed later by calling check().
 		'''
 		self.n=set(n)
 		self.r=set(r)
@@ -122,12 +252,65 @@ class CROI:
 		self.type1=dict(type1)
 		self.plays=set(plays)
 		self.links=dict(links)
+		if check:
+			self.check()
+		self.index()
+
+	def check(self):
+		'''
+		Asserts that the sets are mutual disjoint, type is total, and plays ranges over the given instances.
+		Each tuple is checked componentwise, i.e., without materializing the cartesian product.
+		'''
 		assert mutual_disjoint([self.n,self.r,self.c])
-		assert total_function(self.n | self.r | self.c,self.type1)
-		assert self.plays <= set(itertools.product((self.n | self.c),self.c,self.r))
+		assert all( x in self.type1 for s in (self.n,self.r,self.c) for x in s )
+		assert all( (o in self.n or o in self.c) and c in self.c and r in self.r for (o,c,r) in self.plays )
 		# assert set(self.links.keys()) <= set(itertools.product(self.rst,self.c)) # rst unavailable
 		# assert set(self.links.values()) <= set(powerset(itertools.product(self.r,self.r))) #  powerset not scalable
+
+	def index(self):
+		'''
+		(Re)builds the indexes over the plays-relation and the compartments, i.e.,
+		role -> [(o,c)], compartment -> [(o,r)], (compartment,role type) -> [(o,r)],
+		compartment type -> {c}, and (o,c) -> bitset of the role types played by o in c.
+		Moreover, it drops the cached lifted links and degree tables.
+		Untyped instances are indexed under None, such that a deferred check() reports them.
+		'''
+		self.plays_by_r=dict()
+		self.plays_by_c=dict()
+		self.plays_by_crt=dict()
+		self.c_by_ct=dict()
+		self.rt_bits=dict()
+		self.rts_by_oc=dict()
+		self.evaluators=dict()
+		self.lifted=dict()
+		self.degree_tables=dict()
+		for o,c,r in self.plays:
+			self.plays_by_r.setdefault(r,[]).append((o,c))
+			self.plays_by_c.setdefault(c,[]).append((o,r))
+			self.plays_by_crt.setdefault((c,self.type1.get(r)),[]).append((o,r))
+			self.rts_by_oc[(o,c)]=self.rts_by_oc.get((o,c),0) | self.bit(self.type1.get(c),self.type1.get(r))
+		for c in self.c:
+			self.c_by_ct.setdefault(self.type1.get(c),set()).add(c)
 		
+	def bit(self,ct,rt):
+		'''
+		Returns the bit representing the role type rt in the bitsets of the compartments of type ct,
+		assigning the next free bit to a new role type.
+		'''
+		bits=self.rt_bits.setdefault(ct,dict())
+		if rt not in bits:
+			bits[rt]=1<<len(bits)
+		return bits[rt]
+
+	def evaluator(self,a,ct):
+		'''
+		Returns the compiled evaluator of the RoleGroup a for compartments of type ct,
+		which maps the bitset rts_by_oc[(o,c)] to a^{\\I^c_o}. Evaluators are compiled once per compartment type and node.
+		'''
+		if (ct,a) not in self.evaluators:
+			self.evaluators[(ct,a)]=compile_rolegroup(a,lambda rt: self.bit(ct,rt))
+		return self.evaluators[(ct,a)]
+
 	def __str__(self):
 		'''
 		Returns a String representation of the CROI.
@@ -145,20 +328,49 @@ class CROI:
 		'''
 		\\forall (o,c,r) \\in \\text{plays} : (\\text{type}(o),\\text{type}(c),\\text{type}(r)) \\in \\text{fills}
 		'''
-		return all( (croi.type1[o],croi.type1[c],croi.type1[r]) in crom.fills for o,c,r in croi.plays)
-		
+		return satisfied(croi.violations6(crom))
+
+	def violations6(croi,crom,cs=None):
+		'''
+		Yields the plays (o,c,r) violating axiom6, optionally restricted to the compartments cs.
+		'''
+		return ( (o,c,r) for o,c,r in croi.plays_in(cs) if (croi.type1[o],croi.type1[c],croi.type1[r]) not in crom.fills )
+
 	def axiom7(croi,crom):
 		'''
 		\forall (o,c,r), (o,c,r') \\in \\text{plays} :
 		r \\neq r' \\Rightarrow \\text{type}(r) \\neq \\text{type}(r')
 		'''
-		return all(croi.type1[r_1]!=croi.type1[r] for o_1,c_1,r_1 in croi.plays for o,c,r in croi.plays if o_1==o and c_1==c and r_1!=r)
+		return satisfied(croi.violations7(crom))
+
+	def violations7(croi,crom,cs=None):
+		'''
+		Yields the pairs of plays ((o,c,r),(o,c,r')) violating axiom7 by grouping the plays by (o,c,type(r)),
+		optionally restricted to the compartments cs.
+		'''
+		seen=dict()
+		for o,c,r in croi.plays_in(cs):
+			k=(o,c,croi.type1[r])
+			if k in seen:
+				yield ((o,c,seen[k]),(o,c,r))
+			else:
+				seen[k]=r
 		
 	def axiom8(croi,crom):
 		'''
 		\\forall r \in R \\exists ! o \\in O \\exists ! c \\in C : (o,c,r) \\in \\text{plays}
 		'''
-		return all( len(set([(o,c) for o,c,r_1 in croi.plays if r_1==r]))==1 for r in croi.r )
+		return satisfied(croi.violations8(crom))
+
+	def violations8(croi,crom,rs=None):
+		'''
+		Yields the roles violating axiom8 together with their plays, i.e., (r,[(o,c,r),...]), using the plays grouped by role,
+		optionally restricted to the roles rs.
+		'''
+		for r in (croi.r if rs is None else [ r for r in rs if r in croi.r ]):
+			ps=croi.plays_by_r.get(r,())
+			if len(ps)!=1:
+				yield (r,[ (o,c,r) for o,c in ps ])
 		
 	def axiom9(croi,crom):
 		'''
@@ -167,42 +379,70 @@ class CROI:
 		(_,c,r_1), (_,c,r_2) \\in \\text{plays} \\wedge
 		\\text{rel}(rst,\\text{type}(c))=(\\text{type}(r_1),\\text{type}(r_2))
 		'''
-		return all( (rst,croi.type1[c]) in crom.rel.keys() and \
-		crom.rel[(rst,croi.type1[c])] == (croi.type1[r_1],croi.type1[r_2]) and \
-		any( (o,c,r_1) in croi.plays for o in croi.o() ) and \
-		any( (o,c,r_2) in croi.plays for o in croi.o() )
-		for rst in crom.rst for c in croi.c if (rst,croi.type1[c]) in croi.links \
-		for (r_1,r_2) in croi.links[(rst,croi.type1[c])] )
-	
+		return satisfied(croi.violations9(crom))
+
+	def violations9(croi,crom,cs=None):
+		'''
+		Yields the links ((rst,c),(r_1,r_2)) violating axiom9, optionally restricted to the compartments cs.
+		The links are visited per entry of links, and their endpoints are looked up in the role -> [(o,c)] index.
+		'''
+		if cs is None:
+			keys=[ (rst,c) for (rst,c) in croi.links.iterkeys() if rst in crom.rst and c in croi.c ]
+		else:
+			keys=[ (rst,c) for c in croi.scope(cs) for rst in crom.rst if (rst,c) in croi.links ]
+		for (rst,c) in keys:
+			rel=crom.rel.get((rst,croi.type1[c]))
+			for (r_1,r_2) in croi.links[(rst,c)]:
+				if not ( rel is not None and rel == (croi.type1.get(r_1),croi.type1.get(r_2)) and \
+				any( c_1==c for o,c_1 in croi.plays_by_r.get(r_1,()) ) and \
+				any( c_1==c for o,c_1 in croi.plays_by_r.get(r_2,()) ) ):
+					yield ((rst,c),(r_1,r_2))
+
 	def o(self):
 		'''
 		Returns the union of the natural and compartment instances.
 		'''
 		return self.n | self.c
+
+	def scope(self,cs=None):
+		'''
+		Returns the compartment instances, or only those contained in cs if given.
+		'''
+		if cs is None:
+			return self.c
+		return [ c for c in cs if c in self.c ]
+
+	def plays_in(self,cs=None):
+		'''
+		Returns the plays, or only those within the compartments cs if given.
+		'''
+		if cs is None:
+			return self.plays
+		return [ (o,c,r) for c in self.scope(cs) for o,r in self.plays_by_c.get(c,()) ]
 		
 	def C_ct(self,ct):
 		'''
 		Returns the compartments instances of the given type
 		'''
-		return set(c for c in self.c if self.type1[c]==ct)
+		return set(self.c_by_ct.get(ct,()))
 		
 	def o_c(self,c):
 		'''
 		O^c \\coloneqq \\{ o \\in O \\mid \\exists r \\in R : (o,c,r) \\in \\text{plays} \\}
 		'''
-		return [ o for o,c_1,r in self.plays if c_1==c ]
+		return [ o for o,r in self.plays_by_c.get(c,()) ]
 		
 	def o_c_rt(self,c,rt):
 		'''
 		O^c_{rt} \\coloneqq \\{ o \\in O \\mid \\exists r \\in R : (o,c,r) \\in \\text{plays} \wedge \\text{type}(r)=rt \\}
 		'''
-		return [ o for o,c_1,r in self.plays if c_1==c and self.type1[r]==rt ]
+		return [ o for o,r in self.plays_by_crt.get((c,rt),()) ]
 	
 	def r_c_rt(self,c,rt):
 		'''
 		R^c_{rt} \\coloneqq \\{ r \\in R \\mid (o,c,r) \\in \\text{plays} \wedge \\text{type}(r)=rt \\}
 		'''
-		return [ r for o,c_1,r in self.plays if c_1==c and self.type1[r]==rt ]
+		return [ r for o,r in self.plays_by_crt.get((c,rt),()) ]
 		
 	def pred(self,rst,c,r):
 		'''
@@ -221,39 +461,135 @@ class CROI:
 			return [ r_2 for r_1,r_2 in self.links[(rst,c)] if r_1 == r ]
 		else:
 			return []
+
+	def degrees(self,rst,c):
+		'''
+		Returns the in- and out-degree tables of links(rst,c), i.e., the mappings r -> |pred(rst,c,r)| and r -> |succ(rst,c,r)|
+		containing only roles with a non-zero degree. The tables are built in one pass over the links and cached until index() is called.
+		'''
+		if (rst,c) not in self.degree_tables:
+			indegree=dict()
+			outdegree=dict()
+			for r_1,r_2 in self.links.get((rst,c),()):
+				outdegree[r_1]=outdegree.get(r_1,0)+1
+				indegree[r_2]=indegree.get(r_2,0)+1
+			self.degree_tables[(rst,c)]=(indegree,outdegree)
+		return self.degree_tables[(rst,c)]
 		
 	def player(croi,r):
 		'''
 		Returns the player of a given role or None if None is given.
 		'''
-		for o,c,r_1 in croi.plays:
-			if r_1==r:
-				return o
+		if r in croi.plays_by_r:
+			return croi.plays_by_r[r][0][0]
 		raise ValueError("The given role is not played in the croi")
 	
 	def overline_links(croi,rst,c):
 		'''
 		\\overline{\\text{links}(rst,c)} \\coloneqq & \\{ (\\overline{r_1},\\overline{r_1}) \\mid (r_1,r_2) \\in \\text{links}(rst,c) \\}
+		Missing links(rst,c) are treated as empty. The lifted links are computed once per (rst,c) from the role -> [(o,c)] index and cached until index() is called.
 		'''
-		return set( (croi.player(r_1),croi.player(r_2)) for r_1,r_2 in croi.links[(rst,c)] )
+		if (rst,c) not in croi.lifted:
+			croi.lifted[(rst,c)]=frozenset( (croi.player(r_1),croi.player(r_2)) for r_1,r_2 in croi.links.get((rst,c),()) )
+		return croi.lifted[(rst,c)]
 
 # Defintion of Role Group
 
+def bound(n):
+	'''
+	Returns the given bound as integer, unless it is the positive infinite.
+	'''
+	return n if n==inf else int(n)
+
+def members(xs):
+	'''
+	Returns the members of a group as tuple, where equal role types are contained once (as in a set),
+	while equal subgroups are kept with their multiplicity.
+	'''
+	seen=set()
+	result=[]
+	for x in xs:
+		if isinstance(x,Node):
+			result.append(x)
+		elif x not in seen:
+			seen.add(x)
+			result.append(x)
+	return tuple(result)
+
+def multiset(xs):
+	'''
+	Returns the given elements as hashable multiset, i.e., a frozenset of pairs (x,multiplicity).
+	'''
+	return frozenset(collections.Counter(xs).iteritems())
+
+class Node(object):
+	'''
+	Base class of the immutable nodes of (Quantified) Role Groups. Nodes are hash-consed, i.e.,
+	structurally equal nodes are represented by the same object, and they cache the role types they contain.
+	Hence, nodes can be compared, hashed, and memoized by identity.
+	Note that the members of a group are a multiset of nodes: equal subgroups given several times
+	are kept with their multiplicity, such that each of them counts toward the bounds of the group.
+	'''
+	__slots__=('atoms','__weakref__')
+	fields=()
+	nodes=weakref.WeakValueDictionary()
+
+	def __new__(cls,*args):
+		'''
+		Returns the node for the given arguments, which is only created if no structurally equal node exists.
+		'''
+		values=cls.normalize(*args)
+		key=(cls,cls.signature(values))
+		self=Node.nodes.get(key)
+		if self is None:
+			self=object.__new__(cls)
+			for name,value in zip(cls.fields,values):
+				object.__setattr__(self,name,value)
+			object.__setattr__(self,'atoms',self.collect())
+			Node.nodes[key]=self
+		return self
 
-class RoleGroup:
+	@staticmethod
+	def signature(values):
+		'''
+		Returns the hashable key identifying structurally equal nodes with the given fields.
+		'''
+		return values
+
+	def __setattr__(self,name,value):
+		raise AttributeError("{0} is immutable".format(type(self).__name__))
+
+	def __delattr__(self,name):
+		raise AttributeError("{0} is immutable".format(type(self).__name__))
+
+	def __reduce__(self):
+		'''
+		Pickles the node by its fields, such that it is hash-consed again when unpickled.
+		'''
+		return (type(self),tuple( getattr(self,name) for name in self.fields ))
+
+class RoleGroup(Node):
 	'''
 	Class representation of Role Groups.
 	'''
+	__slots__=('rolegroups','lower','upper')
+	fields=__slots__
 
-	def __init__(self,rolegroups,lower,upper):
+	@staticmethod
+	def normalize(rolegroups,lower,upper):
 		'''
-		Creates a new RoleGroup from the given set as well as the lower and upper bound.
+		Returns the fields of the RoleGroup from the given set as well as the lower and upper bound.
 		'''
-		self.rolegroups = frozenset(rolegroups)
-		self.lower = int(lower)
-		self.upper = int(upper)
 		if not (0 <= lower <= upper):
 			raise ValueError("lower must be less or equal to upper")
+		return (members(rolegroups),bound(lower),bound(upper))
+
+	@staticmethod
+	def signature(values):
+		return (multiset(values[0]),)+values[1:]
+
+	def collect(self):
+		return frozenset().union(*[ atoms(b) for b in self.rolegroups ])
 			
 	def __str__(self):
 		'''
@@ -263,12 +599,12 @@ class RoleGroup:
 		
 def atoms(a):
 	'''
-	Recursively, collects the role types (leaf nodes) contained in the given RoleGroup.
+	Returns the role types (leaf nodes) contained in the given RoleGroup, which are cached by the node.
 	'''
-	if isinstance(a,RoleGroup):
-		return reduce(set.union, map(atoms, a.rolegroups),set())
+	if isinstance(a,Node):
+		return a.atoms
 	else:
-		return set([a])
+		return frozenset([a])
 
 # Semantics of Role Groups
 
@@ -280,57 +616,95 @@ def evaluate(a,croi,o,c):
 		& \\text{\\textbf{or}} \\quad a \\equiv (B,n,m) \\wedge n \\leq \\sum\\nolimits_{b \\in B}{b^{\\I^c_o}} \\leq m\\\\
 	0 & \\text{\\textbf{otherwise}}
 	\\end{cases}	
+	The compiled evaluator of a is applied to the bitset of the role types played by o in c.
 	'''
-	if isinstance(a,RoleGroup):
-		if (a.lower <= sum( evaluate(b,croi,o,c) for b in a.rolegroups ) <= a.upper):
-			return 1
-		else:
-			return 0
-	else:
-		if any( (o,c,r) in croi.plays for r in croi.r if croi.type1[r]==a ):
-			return 1
+	return croi.evaluator(a,croi.type1[c])(croi.rts_by_oc.get((o,c),0))
+
+def compile_rolegroup(a,bit):
+	'''
+	Compiles the given RoleGroup or role type into a function evaluating it on a bitset of played role types,
+	where bit maps each role type to its bit. Role types directly contained in a group are counted at once.
+	'''
+	if not isinstance(a,RoleGroup):
+		b=bit(a)
+		return lambda mask: 1 if mask & b else 0
+	leaves=0
+	groups=[]
+	for b in a.rolegroups:
+		if isinstance(b,RoleGroup):
+			groups.append(compile_rolegroup(b,bit))
 		else:
-			return 0
+			leaves|=bit(b)
+	lower,upper=a.lower,a.upper
+	if not groups:
+		return lambda mask: 1 if lower <= bin(mask & leaves).count('1') <= upper else 0
+	return lambda mask: 1 if lower <= bin(mask & leaves).count('1')+sum( g(mask) for g in groups ) <= upper else 0
 
+def value_range(a):
+	'''
+	Returns the bounds (min,max) of a^{\\I^c_o} over all objects and compartments, where the number of contained groups
+	evaluating to 1 is estimated by the sums of their minima and maxima. Hence, a group with (1,1) is a tautology.
+	'''
+	if not isinstance(a,RoleGroup):
+		return (0,1)
+	ranges=[ value_range(b) for b in a.rolegroups ]
+	low=sum( l for l,h in ranges )
+	high=sum( h for l,h in ranges )
+	if a.lower <= low and high <= a.upper:
+		return (1,1)
+	if high < a.lower or a.upper < low:
+		return (0,0)
+	return (0,1)
 
-class QuantifiedRoleGroup:
+
+class QuantifiedRoleGroup(Node):
 	'''
-	Class representation of Role Groups.
+	Class representation of Quantified Role Groups.
 	'''
-	def __init(self):
-		pass
+	__slots__=()
 		
 class QuantifiedGroup(QuantifiedRoleGroup):
-	def __init__(self,qrgs,lower,upper):
+	__slots__=('qrgs','lower','upper')
+	fields=__slots__
+
+	@staticmethod
+	def normalize(qrgs,lower,upper):
 		'''
-		Creates a new QuantifiedRoleGroup from the given set as well as the lower and upper bound.
+		Returns the fields of the QuantifiedGroup from the given set as well as the lower and upper bound.
 		'''
-		super(QuantifiedGroup, self).__init__()
-		self.qrgs = frozenset(qrgs)
-		self.lower = int(lower)
-		self.upper = int(upper)
 		if not (0 <= lower <= upper):
 			raise ValueError("lower must be less or equal to upper")
+		return (members(qrgs),bound(lower),bound(upper))
+
+	@staticmethod
+	def signature(values):
+		return (multiset(values[0]),)+values[1:]
+
+	def collect(self):
+		return frozenset().union(*[ atoms(b) for b in self.qrgs ])
 			
 	def __str__(self):
 		'''
 		Returns a String representation of the RoleGroup.
 		'''
-		return "QuantifiedGroup({0},{1},{2})".format(self.rolegroups,self.lower,self.upper)
+		return "QuantifiedGroup({0},{1},{2})".format(self.qrgs,self.lower,self.upper)
 		
 		
 class Quantification(QuantifiedRoleGroup):
-	def __init__(self,ct,lower,upper,rolegroup):
+	__slots__=('ct','lower','upper','rolegroup')
+	fields=__slots__
+
+	@staticmethod
+	def normalize(ct,lower,upper,rolegroup):
 		'''
-		Creates a new QuantifiedRoleGroup from the given set as well as the lower and upper bound.
+		Returns the fields of the Quantification from the given compartment type, lower and upper bound, and RoleGroup.
 		'''
-		super(Quantification, self).__init__()
-		self.ct=ct
-		self.lower = int(lower)
-		self.upper = int(upper)
-		self.rolegroup = RoleGroup(rolegroup.rolegroups,rolegroup.lower,rolegroup.upper)
 		if not (0 <= lower <= upper):
 			raise ValueError("lower must be less or equal to upper")
+		return (ct,bound(lower),bound(upper),rolegroup)
+
+	def collect(self):
+		return atoms(self.rolegroup)
 			
 	def __str__(self):
 		'''
@@ -343,11 +717,11 @@ def unbound(crom,a):
 	Recursively, collects the role types not contained in the quantified compartment types.
 	'''
 	if isinstance(a,QuantifiedGroup):
-	  return set([ unbound(crom,b) for b in a.qrgs])
+	  return frozenset().union(*[ unbound(crom,b) for b in a.qrgs])
 	elif isinstance(a,Quantification):
-	  return atoms(a) - crom.parts(ct)
+	  return atoms(a) - crom.parts(a.ct)
 	else:
-		raise ValueError("Given object was neither a QuantifiedGroup nor a Quantification: "+string(a))
+		raise ValueError("Given object was neither a QuantifiedGroup nor a Quantification: "+str(a))
 
 # Semantics of Quantified Role Groups
 
@@ -361,24 +735,127 @@ def evaluateQ(a,croi,o):
 	\\end{cases}	
 	'''
 	if isinstance(a,QuantifiedGroup):
-		if (a.lower <= sum( evaluateQ(b,croi,o) for b in a.rolegroups ) <= a.upper):
+		if (a.lower <= sum( evaluateQ(b,croi,o) for b in a.qrgs ) <= a.upper):
 			return 1
 		else:
 			return 0
 	elif isinstance(a,Quantification):
-		if (a.lower <= sum( evaluate(a.rolegroup,croi,o,c) for c in croi.C_ct(a.ct) ) <= a.upper):
+		f=croi.evaluator(a.rolegroup,a.ct)
+		if (a.lower <= sum( f(croi.rts_by_oc.get((o,c),0)) for c in croi.c_by_ct.get(a.ct,()) ) <= a.upper):
 			return 1
 		else:
 			return 0		
 	else:
-		raise ValueError("Given object was neither a QuantifiedGroup nor a Quantification: "+string(a))	
+		raise ValueError("Given object was neither a QuantifiedGroup nor a Quantification: "+str(a))	
+
+def batch_evaluateQ(a,croi,memo=None):
+	'''
+	Returns the evaluation of the given QuantifiedGroup or Quantification for all objects as pair (default,values),
+	where values maps the objects playing roles in compartments of the quantified types to a^{\\I_o}
+	and all other objects evaluate to default. For each Quantification the objects are counted in one pass
+	over the plays in compartments of its type. The results are memoized per node in memo.
+	'''
+	if memo is None:
+		memo=dict()
+	if a in memo:
+		return memo[a]
+	if isinstance(a,QuantifiedGroup):
+		children=[ batch_evaluateQ(b,croi,memo) for b in a.qrgs ]
+		default=int(a.lower <= sum( d for d,v in children ) <= a.upper)
+		values=dict( (o,int(a.lower <= sum( v.get(o,d) for d,v in children ) <= a.upper)) \
+		for o in set().union(*[ v for d,v in children ]) )
+	elif isinstance(a,Quantification):
+		f=croi.evaluator(a.rolegroup,a.ct)
+		# objects not playing in a compartment are evaluated on the empty bitset
+		empty=f(0)
+		cs=croi.c_by_ct.get(a.ct,())
+		counts=dict()
+		for c in cs:
+			for o in set( o for o,r in croi.plays_by_c.get(c,()) ):
+				counts[o]=counts.get(o,0)+f(croi.rts_by_oc[(o,c)])-empty
+		default=int(a.lower <= len(cs)*empty <= a.upper)
+		values=dict( (o,int(a.lower <= len(cs)*empty+n <= a.upper)) for o,n in counts.iteritems() )
+	else:
+		raise ValueError("Given object was neither a QuantifiedGroup nor a Quantification: "+str(a))
+	memo[a]=(default,values)
+	return memo[a]
+
+# Registry of intra relationship constraints
+
+class IntraConstraint(object):
+	'''
+	Class representation of a named intra-relationship constraint f(A,B,r) together with its time complexity.
+	Optionally, it provides an implementation on the adjacency matrix of r, which is used for dense relations if NumPy is available.
+	'''
+	# minimal number of nodes and ratio of links to node pairs of a dense relation
+	minimum=64
+	density=0.25
+
+	def __init__(self,name,function,complexity,matrix=None):
+		'''
+		Creates a new IntraConstraint from the given name, function f(A,B,r), and complexity as well as the optional function m(M,ab)
+		on the boolean adjacency matrix M of r and the indexes ab of the nodes in A \\cup B.
+		'''
+		self.name=name
+		self.function=function
+		self.complexity=complexity
+		self.matrix=matrix
+
+	def __call__(self,a,b,r):
+		if self.matrix is not None and numpy is not None and len(r)>0:
+			nodes=dict( (x,i) for i,x in enumerate(set(a) | set(b) | set( x for l in r for x in l )) )
+			n=len(nodes)
+			if n>=self.minimum and len(r)>=self.density*n*n:
+				m=numpy.zeros((n,n),dtype=bool)
+				m[[ nodes[x] for x,y in r ],[ nodes[y] for x,y in r ]]=True
+				return self.matrix(m,numpy.array([ nodes[x] for x in set(a) | set(b) ],dtype=numpy.int_))
+		return self.function(a,b,r)
+
+	def __repr__(self):
+		return self.name
+
+	def __reduce__(self):
+		return (intra_constraint,(self.name,))
+
+intra_constraints=dict()
+
+def register(name,function,complexity,matrix=None):
+	'''
+	Registers and returns a new IntraConstraint, such that it can be selected by its name in a ConstraintModel.
+	'''
+	intra_constraints[name]=IntraConstraint(name,function,complexity,matrix)
+	return intra_constraints[name]
+
+def intra_constraint(f):
+	'''
+	Returns the registered IntraConstraint of the given name, or f itself if it is a function.
+	'''
+	if callable(f):
+		return f
+	if f not in intra_constraints:
+		raise ValueError("Unknown intra-relationship constraint: "+str(f))
+	return intra_constraints[f]
+
+def total_pairs(a,b,r):
+	'''
+	Returns true iff each pair of distinct elements of A \\cup B is related by r in some direction,
+	by counting the distinct unordered pairs contained in r in O(|A \\cup B|+|r|).
+	'''
+	ab=set(a) | set(b)
+	pairs=set( frozenset((x,y)) for x,y in r if x!=y and x in ab and y in ab )
+	return len(pairs)==len(ab)*(len(ab)-1)/2
 
 #Definition of standard intra relationship constraints
-irreflexive=lambda a,b,r: not(any( x==y for x,y in r))
-reflexive=lambda a,b,r: all( (x,x) in r for x in (a|b) )
-acyclic=lambda a,b,r: not(any( x==y for x,y in transitive_closure(r) ))
-cyclic=lambda a,b,r: all( (x,x) in r for x,y in transitive_closure(r) )
-total=lambda a,b,r: all( x==y or (x,y) in r or (y,x) in r for x in (a|b) for y in (a|b) )
+irreflexive=register('irreflexive',lambda a,b,r: not(any( x==y for x,y in r)),"O(|r|)",
+	lambda m,ab: not m.diagonal().any())
+reflexive=register('reflexive',lambda a,b,r: all( (x,x) in r for x in (a|b) ),"O(|A|+|B|)",
+	lambda m,ab: bool(m.diagonal()[ab].all()))
+acyclic=register('acyclic',lambda a,b,r: not(has_cycle(r)),"O(|r|)")
+# the domain of transitive_closure(r) is the domain of r
+cyclic=register('cyclic',lambda a,b,r: all( (x,x) in r for x,y in r ),"O(|r|)",
+	lambda m,ab: bool((m.diagonal() | ~m.any(axis=1)).all()))
+total=register('total',total_pairs,"O(|A|+|B|+|r|)",
+	lambda m,ab: bool(((m | m.T) | numpy.eye(len(m),dtype=bool))[numpy.ix_(ab,ab)].all()))
 
 # Definition of the positive infinite
 inf=float("inf")
@@ -393,12 +870,31 @@ class ConstraintModel:
 	def __init__(self,rolec,card,intra,inter,grolec):
 		'''
 		Creates a new ConstraintModel from the given role constraint and cardinality mappings as well as from the set of intra-relationship constraints.
+		The functions of intra-relationship constraints can also be given by the name of a registered IntraConstraint.
 		'''
 		self.rolec=dict(rolec)
 		self.card=dict(card)
-		self.intra=frozenset(intra)
+		self.intra=frozenset( (rst,ct,intra_constraint(f)) for (rst,ct,f) in intra )
 		self.inter=frozenset(inter)
 		self.grolec=frozenset(grolec)
+		self.verdicts=dict()
+		self.plans=dict()
+
+	def invalidate(self):
+		'''
+		Drops the cached compliance verdicts and evaluation plans, e.g., after the ConstraintModel or one of the checked CROMs was modified.
+		'''
+		self.verdicts.clear()
+		self.plans.clear()
+
+	def plan(self,crom):
+		'''
+		Returns the ConstraintPlan of the ConstraintModel for the given CROM.
+		The plan is cached in plans[crom] until invalidate() is called.
+		'''
+		if crom not in self.plans:
+			self.plans[crom]=ConstraintPlan(self,crom)
+		return self.plans[crom]
 		
 	def __str__(self):
 		'''
@@ -409,38 +905,67 @@ class ConstraintModel:
 	def compliant(self,crom):
 		'''
 		Returns true iff the ConstraintModel is compliant to the given CROM.
-		'''
-		return crom.wellformed() and self.axiom10(crom) and \
-		self.axiom11(crom) and self.axiom12(crom) and self.axiom13(crom)
-		#and self.axiom14(crom)
+		The verdict of the axioms 10-13 is cached in verdicts[crom] until invalidate() is called,
+		whereas the well-formedness is taken from the CROM, such that its invalidate() carries through.
+		'''
+		if not crom.wellformed():
+			return False
+		if crom not in self.verdicts:
+			self.verdicts[crom]=self.axiom10(crom) and \
+			self.axiom11(crom) and self.axiom12(crom) and self.axiom13(crom)
+			#and self.axiom14(crom)
+		return self.verdicts[crom]
 		
 	def axiom10(cm,crom):
 		'''
 		\\forall ct \\in \textbf{domain}(rolec) \\forall (c,a) \\in \\text{rolec}(ct) :
 		\\text{atoms}(a) \\subseteq \\text{parts}(ct)
 		'''
-		return all( atoms(a) <= crom.parts(ct) for ct in cm.rolec.keys() for crd,a in cm.rolec[ct] )
+		return satisfied(cm.violations10(crom))
+
+	def violations10(cm,crom):
+		'''
+		Yields the role constraints (ct,(crd,a)) violating axiom10.
+		'''
+		return ( (ct,(crd,a)) for ct in cm.rolec.keys() for crd,a in cm.rolec[ct] if not atoms(a) <= crom.parts(ct) )
 
 	def axiom11(cm,crom):
 		'''
 		\\mathbf{domain}(card) \\subseteq \\mathbf{domain}(rel)
 		'''
-		return set(cm.card.keys()) <= set(crom.rel.keys())
-		
+		return satisfied(cm.violations11(crom))
+
+	def violations11(cm,crom):
+		'''
+		Yields the keys (rst,ct) of card violating axiom11.
+		'''
+		return ( k for k in cm.card.iterkeys() if k not in crom.rel )
+
 	def axiom12(cm,crom):
 		'''
 				\\forall (rst,ct,_) \\in \\text{intra} : (rst,ct) \\in \\mathbf{domain}(rel) 
 		'''
-		return all( (rst,ct) in crom.rel.keys() for (rst,ct,e) in cm.intra )
+		return satisfied(cm.violations12(crom))
+
+	def violations12(cm,crom):
+		'''
+		Yields the intra-relationship constraints (rst,ct,e) violating axiom12.
+		'''
+		return ( (rst,ct,e) for (rst,ct,e) in cm.intra if (rst,ct) not in crom.rel )
 
 	def axiom13(cm,crom):
 		'''
 		\\forall (rst_1,ct,_,rst_2) \in \\text{inter} : rst_1 \\neq rst_2
 		(rst_1,ct),(rst_2,ct) \\in \\mathbf{domain}(rel) 
 		'''
-		return all( rst1 != rst2 and \
-		(rst1,ct) in crom.rel.keys() and (rst2,ct) in crom.rel.keys() \
-		for (rst1,ct,e,rst2) in cm.inter )
+		return satisfied(cm.violations13(crom))
+
+	def violations13(cm,crom):
+		'''
+		Yields the inter-relationship constraints (rst_1,ct,e,rst_2) violating axiom13.
+		'''
+		return ( (rst1,ct,e,rst2) for (rst1,ct,e,rst2) in cm.inter \
+		if not ( rst1 != rst2 and (rst1,ct) in crom.rel and (rst2,ct) in crom.rel ) )
 
 	def oldaxiom14(cm,crom):
 		'''
@@ -448,30 +973,86 @@ class ConstraintModel:
 		'''
 		return all( len(unbound(crom,a))==1 for a in cm.grolec ) 
 	
-	def validity(self,crom,croi):
+	def validity(self,crom,croi,processes=None):
 		'''
 		Returns true iff the ConstraintModel is compliant to the given CROM and the given CROI is valid wrt. the ConstraintModel
+		If processes is given, the axioms 14 and 16-19 are evaluated in parallel by a pool of that many processes.
 		'''
+		# both compliance checks only evaluate axioms 1-13 once per model due to the cached verdicts
+		if processes:
+			return self.compliant(crom) and croi.compliant(crom) and \
+			self.axiom15(crom,croi) and self.axiom20(crom,croi) and \
+			len(self.parallel_violations(crom,croi,processes))==0
 		return self.compliant(crom) and croi.compliant(crom) and self.axiom14(crom,croi) and \
 		self.axiom15(crom,croi) and self.axiom16(crom,croi) and self.axiom17(crom,croi) and \
 		self.axiom18(crom,croi) and self.axiom19(crom,croi) and self.axiom20(crom,croi) 
 
+	def parallel_violations(self,crom,croi,processes=None,axioms=(14,16,17,18,19),chunks=4):
+		'''
+		Returns the violations (axiom,witness) of the given per compartment axioms by partitioning the compartments
+		into chunks per process of a process pool. The workers read the models from a snapshot shared by forking,
+		and the witnesses are only collected for the violating compartments reported by the workers.
+		If the pool cannot fork, e.g., on Windows, the chunks are checked serially instead.
+		'''
+		global _snapshot
+		cs=list(croi.c)
+		n=max(1,(processes or multiprocessing.cpu_count())*chunks)
+		tasks=[ (axioms,cs[i::n]) for i in range(n) if cs[i::n] ]
+		# the plan is built before forking, such that it is shared by all workers
+		self.plan(crom)
+		_snapshot=(self,crom,croi)
+		try:
+			if forking():
+				pool=multiprocessing.Pool(processes)
+				try:
+					failed=[ f for fs in pool.imap_unordered(_violating_compartments,tasks) for f in fs ]
+				finally:
+					pool.terminate()
+					pool.join()
+			else:
+				failed=[ f for task in tasks for f in _violating_compartments(task) ]
+		finally:
+			_snapshot=None
+		return [ ('axiom{0}'.format(i),v) for i,c in failed for v in getattr(self,'violations{0}'.format(i))(crom,croi,[c]) ]
+
 	def axiom14(cm,crom,croi):
 		'''
 		\\forall ct \\in CT \\forall (i..j,a) \\in \\text{rolec}(ct) \\forall c \\in C_{ct} :
 		i \\leq \\big(\\sum\\nolimits_{o \\in O^c}{a^{\\I^c_o}}\\big) \\leq j
 		'''
-		return all( \
-		crd[0] <= sum( [evaluate(a,croi,o,c) for o in croi.o_c(c)] ) <= crd[1] \
-		for ct in crom.ct if ct in cm.rolec	for crd,a in cm.rolec[ct] for c in croi.C_ct(ct) )
-		
+		return satisfied(cm.violations14(crom,croi))
+
+	def violations14(cm,crom,croi,cs=None):
+		'''
+		Yields the triples (c,(crd,a),n) violating axiom14, where n is the number of occurrences of a in c,
+		optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		for c in croi.scope(cs):
+			ct=croi.type1[c]
+			if ct in plan.rolec:
+				for crd,a in plan.rolec[ct]:
+					f=croi.evaluator(a,ct)
+					n=sum( [f(croi.rts_by_oc[(o,c)]) for o in croi.o_c(c)] )
+					if not ( crd[0] <= n <= crd[1] ):
+						yield (c,(crd,a),n)
+
 	def axiom15(cm,crom,croi):
 		'''
 		\\forall (o,c,r) \\in \\text{plays} \\forall(crd,a) \\in \\text{rolec}(\\text{type}(c)) :
 		\\text{type}(r) \\in \\text{atoms}(a) \\Rightarrow a^{\\I^c_o} = 1
 		'''
-		return all( evaluate(a,croi,o,c)==1 for o,c,r in croi.plays if croi.type1[c] in cm.rolec for crd,a in cm.rolec[croi.type1[c]] if croi.type1[r] in atoms(a) )
-		
+		return satisfied(cm.violations15(crom,croi))
+
+	def violations15(cm,crom,croi,cs=None):
+		'''
+		Yields the pairs ((o,c,r),(crd,a)) violating axiom15, optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		return ( ((o,c,r),(crd,a)) for o,c,r in croi.plays_in(cs) \
+		for crd,a in plan.rolec.get(croi.type1[c],()) if croi.type1[r] in atoms(a) \
+		and croi.evaluator(a,croi.type1[c])(croi.rts_by_oc[(o,c)])!=1 )
+
 	def axiom16(cm,crom,croi):
 		'''
 		\\forall c \\in C \\forall (rst,type(c)) \\in \mathbf{domain}(card) :
@@ -480,36 +1061,336 @@ class ConstraintModel:
 		\\big( \\forall r_2 \\in R^c_{rt_2}: i \\leq \\big| \\text{pred}(rst,c,r_2) \\big| \\leq j \\big) \\wedge
 		\\big( \\forall r_1 \\in R^c_{rt_1}: k \\leq \\big| \\text{succ}(rst,c,r_1) \\big| \\leq l \\big)		
 		'''
-		return all( \
-		all( cm.card[(rst,ct)][0][0] <= len( croi.pred(rst,c,r_2) ) <= cm.card[(rst,ct)][0][1] \
-		for r_2 in croi.r_c_rt(c,crom.rel[(rst,ct)][1]) ) and \
-		all( cm.card[(rst,ct)][1][0] <= len( croi.succ(rst,c,r_1) ) <= cm.card[(rst,ct)][1][1] \
-		for r_1 in croi.r_c_rt(c,crom.rel[(rst,ct)][0]) ) \
-		for c in croi.c for (rst,ct) in cm.card.keys() if ct==croi.type1[c] )
+		return satisfied(cm.violations16(crom,croi))
+
+	def violations16(cm,crom,croi,cs=None):
+		'''
+		Yields the tuples ((rst,c),'pred',r_2,n) and ((rst,c),'succ',r_1,n) violating axiom16,
+		where n is the number of predecessors or successors, respectively, optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		for c in croi.scope(cs):
+			for rst,(rt_1,rt_2),((i,j),(k,l)),(preds,succs) in plan.card.get(croi.type1[c],()):
+				indegree,outdegree=croi.degrees(rst,c)
+				for r_2 in ( croi.r_c_rt(c,rt_2) if preds else () ):
+					n=indegree.get(r_2,0)
+					if not ( i <= n <= j ):
+						yield ((rst,c),'pred',r_2,n)
+				for r_1 in ( croi.r_c_rt(c,rt_1) if succs else () ):
+					n=outdegree.get(r_1,0)
+					if not ( k <= n <= l ):
+						yield ((rst,c),'succ',r_1,n)
 
 	def axiom17(cm,crom,croi):
 		'''
 		\\forall c \\in C \\forall (rst,type(c),f) \\in intra: \\text{rel}(rst,\\text{type}(c))=(rt_1,rt_2) \wedge f(O^c_{rt_1}, O^c_{rt_1}), \\overline{\\text{links}(rst,c)})=1
 		'''
-		return all( f(set( croi.o_c_rt(c,crom.rel[ (rst,croi.type1[c]) ][0]) ), \
-		set( croi.o_c_rt(c,crom.rel[ (rst,croi.type1[c]) ][1]) ), \
-		croi.overline_links(rst,c) )==1 \
-		for c in croi.c for (rst,ct,f) in cm.intra if ct==croi.type1[c] and (rst,c) in croi.links)
-		
+		return satisfied(cm.violations17(crom,croi))
+
+	def violations17(cm,crom,croi,cs=None):
+		'''
+		Yields the pairs ((rst,c),f) violating axiom17, optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		return ( ((rst,c),f) for c in croi.scope(cs) for rst,(rt_1,rt_2),f in plan.intra.get(croi.type1[c],()) \
+		if (rst,c) in croi.links and f(set( croi.o_c_rt(c,rt_1) ), set( croi.o_c_rt(c,rt_2) ), croi.overline_links(rst,c) )!=1 )
+
 	def axiom18(cm,crom,croi):
 		'''
 		\\forall c \in C &\ \\forall (rst_1,ct,\otimes,rst_2) \in inter\!:  \\overline{\\text{links}(rst_1,c)} \\cap \\overline{\\text{links}(rst_2,c)} = \emptyset
 		'''
-		return all( len(croi.overline_links(rst1,c) & croi.overline_links(rst2,c))==0 for c in croi.c for rst1,ct,e,rst2 in cm.inter if ct==croi.type1[c] and e==">-<")
-		
+		return satisfied(cm.violations18(crom,croi))
+
+	def violations18(cm,crom,croi,cs=None):
+		'''
+		Yields the pairs ((rst_1,c,rst_2),links) violating axiom18, where links are the shared lifted links,
+		optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		for c in croi.scope(cs):
+			for rst1,rst2 in plan.inter.get((croi.type1[c],exclusion),()):
+				shared=croi.overline_links(rst1,c) & croi.overline_links(rst2,c)
+				if len(shared)>0:
+					yield ((rst1,c,rst2),shared)
+
 	def axiom19(cm,crom,croi):
 		'''
 		\\forall c \in C &\ \\forall (rst_1,ct,\\trianglelefteq,rst_2) \in inter\!: \\overline{\\text{links}(rst_1,c)} \\subseteq \\overline{\\text{links}(rst_2,c)}
 		'''
-		return all( croi.overline_links(rst1,c) <= croi.overline_links(rst2,c) for c in croi.c for rst1,ct,i,rst2 in cm.inter if ct==croi.type1[c] and i=="-|>")
-		
+		return satisfied(cm.violations19(crom,croi))
+
+	def violations19(cm,crom,croi,cs=None):
+		'''
+		Yields the pairs ((rst_1,c,rst_2),links) violating axiom19, where links are the lifted links of rst_1 missing in rst_2,
+		optionally restricted to the compartments cs.
+		'''
+		plan=cm.plan(crom)
+		for c in croi.scope(cs):
+			for rst1,rst2 in plan.inter.get((croi.type1[c],implication),()):
+				missing=croi.overline_links(rst1,c) - croi.overline_links(rst2,c)
+				if len(missing)>0:
+					yield ((rst1,c,rst2),missing)
+
 	def axiom20(cm,crom,croi):
 		'''
 		\\forall o \in O \\forall a \in grolec: a^{\I_o} = 1
 		'''
-		return all( evaluateQ(a,croi,o)==1 for o in croi.o() for a in cm.grolec )
+		return satisfied(cm.violations20(crom,croi))
+
+	def violations20(cm,crom,croi,os=None):
+		'''
+		Yields the pairs (o,a) violating axiom20, optionally restricted to the objects os.
+		Without restriction, the global role constraints are evaluated for all objects at once by batch_evaluateQ.
+		'''
+		if os is not None:
+			return ( (o,a) for o in os if o in croi.n or o in croi.c for a in cm.grolec if evaluateQ(a,croi,o)!=1 )
+		memo=dict()
+		results=[ (a,)+batch_evaluateQ(a,croi,memo) for a in cm.grolec ]
+		return ( (o,a) for o in croi.o() for a,d,v in results if v.get(o,d)!=1 )
+
+class ConstraintPlan:
+	'''
+	Class representation of the evaluation plan of a ConstraintModel for a CROM, which groups the constraints
+	checked per compartment (axioms 14-19) by the compartment type they apply to.
+	'''
+
+	def __init__(self,cm,crom,simplify=True):
+		'''
+		Creates the mappings compartment type -> [(crd,a)] of role constraints, compartment type -> [(rst,(rt_1,rt_2),crd,(preds,succs))]
+		of cardinalities, where preds and succs tell whether the respective side is checked, compartment type -> [(rst,(rt_1,rt_2),f)] of intra-relationship constraints with the resolved
+		relationship types, and (compartment type,e) -> [(rst_1,rst_2)] of inter-relationship constraints.
+		Cardinalities and intra-relationship constraints of relationships not contained in rel are omitted (cf. axiom11 and axiom12).
+		If simplify is set, the constraints that can never be violated are pruned and recorded in pruned.
+		'''
+		self.rel=crom.rel
+		self.pruned=[]
+		self.rolec=dict()
+		for ct in cm.rolec:
+			if ct in crom.ct:
+				self.rolec[ct]=self.prune_rolec(ct,cm.rolec[ct]) if simplify else list(cm.rolec[ct])
+		self.card=dict()
+		for (rst,ct),crd in cm.card.iteritems():
+			# an unbounded side (0..inf) of a cardinality is skipped by axiom16
+			unbounded=[ side for side,(i,j) in zip(['pred','succ'],crd) if simplify and i<=0 and j==inf ]
+			if unbounded:
+				self.pruned.append(('card',(rst,ct),crd,'unbounded' if len(unbounded)==2 else 'unbounded '+unbounded[0]))
+			if (rst,ct) in crom.rel and len(unbounded)<2:
+				self.card.setdefault(ct,[]).append((rst,crom.rel[(rst,ct)],crd,('pred' not in unbounded,'succ' not in unbounded)))
+		self.intra=dict()
+		for (rst,ct,f) in cm.intra:
+			if (rst,ct) in crom.rel:
+				self.intra.setdefault(ct,[]).append((rst,crom.rel[(rst,ct)],f))
+		self.inter=dict()
+		for (rst1,ct,e,rst2) in cm.inter:
+			self.inter.setdefault((ct,e),[]).append((rst1,rst2))
+
+	def prune_rolec(self,ct,constraints):
+		'''
+		Returns the role constraints of ct without those that can never be violated, i.e., (0..inf,a) where a is a role type
+		or a tautology, and those subsumed by a constraint on the same role group with tighter (or equal) bounds.
+		'''
+		result=[]
+		for n,(crd,a) in enumerate(constraints):
+			# a role type or tautology is 1 for each play of its role types (axiom15)
+			if crd[0]<=0 and crd[1]==inf and (not isinstance(a,RoleGroup) or value_range(a)==(1,1)):
+				self.pruned.append(('rolec',ct,(crd,a),'unbounded'))
+			elif any( b == a and crd[0] <= d[0] and d[1] <= crd[1] and (d!=crd or m<n) for m,(d,b) in enumerate(constraints) ):
+				self.pruned.append(('rolec',ct,(crd,a),'subsumed'))
+			else:
+				result.append((crd,a))
+		return result
+
+	def savings(self,croi):
+		'''
+		Returns the number of evaluations avoided by the pruned constraints for the given CROI per axiom, i.e.,
+		role groups per compartment (axiom14) and per play (axiom15) as well as degrees per role (axiom16).
+		'''
+		result={'axiom14':0,'axiom15':0,'axiom16':0}
+		for kind,key,constraint,reason in self.pruned:
+			if kind=='rolec':
+				crd,a=constraint
+				cs=croi.c_by_ct.get(key,())
+				result['axiom14']+=len(cs)
+				result['axiom15']+=sum( 1 for c in cs for o,r in croi.plays_by_c.get(c,()) if croi.type1[r] in atoms(a) )
+			elif key in self.rel:
+				rst,ct=key
+				rts=[ rt for side,rt in zip(['succ','pred'],self.rel[key]) if reason in ('unbounded','unbounded '+side) ]
+				result['axiom16']+=sum( len(croi.plays_by_crt.get((c,rt),())) for c in croi.c_by_ct.get(ct,()) for rt in rts )
+		return result
+
+# Parallel Validation
+
+_snapshot=None
+
+def forking():
+	'''
+	Returns true iff new processes are forked, i.e., the workers of a process pool share the snapshot.
+	'''
+	if hasattr(multiprocessing,'get_start_method'):
+		return multiprocessing.get_start_method()=='fork'
+	return sys.platform!='win32'
+
+def _violating_compartments(task):
+	'''
+	Returns the pairs (axiom,c) of the compartments c in the given chunk that violate one of the given axioms
+	wrt. the models in the snapshot.
+	'''
+	axioms,cs=task
+	cm,crom,croi=_snapshot
+	return [ (i,c) for c in cs for i in axioms if not satisfied(getattr(cm,'violations{0}'.format(i))(crom,croi,[c])) ]
+
+# Diagnostics
+
+def report(crom,croi=None,cm=None,limit=None):
+	'''
+	Lazily yields the violations (axiom,witness) of the given CROM and, if given, of the CROI and the ConstraintModel.
+	Each axiom is evaluated at most once and at most limit violations are yielded per axiom (all if limit is None).
+	The axioms 14-20 are only evaluated if the ConstraintModel is compliant and the CROI exhibits no violations.
+	'''
+	sound=True
+	checks=[ ('axiom{0}'.format(i),getattr(crom,'violations{0}'.format(i)),()) for i in range(1,6) ]
+	if croi is not None:
+		checks+=[ ('axiom{0}'.format(i),getattr(croi,'violations{0}'.format(i)),(crom,)) for i in range(6,10) ]
+	if cm is not None:
+		checks+=[ ('axiom{0}'.format(i),getattr(cm,'violations{0}'.format(i)),(crom,)) for i in range(10,14) ]
+	for name,violations,args in checks:
+		for v in itertools.islice(violations(*args),limit):
+			sound=False
+			yield (name,v)
+	if croi is not None and cm is not None and sound:
+		for i in range(14,21):
+			for v in itertools.islice(getattr(cm,'violations{0}'.format(i))(crom,croi),limit):
+				yield ('axiom{0}'.format(i),v)
+
+# Incremental Validation
+
+class IncrementalCROI(CROI):
+	'''
+	Class representation of a mutable CROI that incrementally maintains its violations of
+	the axioms 6-9 and 14-20 wrt. a fixed CROM and ConstraintModel.
+	'''
+
+	compartmentaxioms=[6,7,9,14,15,16,17,18,19]
+
+	def __init__(self,crom,cm,n,r,c,type1,plays,links,check=True):
+		'''
+		Creates a new IncrementalCROI for the given CROM and ConstraintModel from the given sets of naturals, roles, compartments;
+		the type mapping; the plays-relation; and links-function.
+		'''
+		CROI.__init__(self,n,r,c,type1,plays,dict( (k,set(v)) for k,v in dict(links).iteritems() ),check)
+		self.crom=crom
+		self.cm=cm
+		self.witnesses=dict( (i,dict()) for i in self.compartmentaxioms+[8,20] )
+		self.revalidate(self.c,self.r,self.o())
+
+	def revalidate(self,cs=(),rs=(),os=()):
+		'''
+		Recomputes the violations for the given compartments (axioms 6,7,9,14-19), roles (axiom 8), and objects (axiom 20).
+		The axioms 14-19 are only evaluated for compartments whose links connect played roles,
+		and the axioms 14-20 only if the ConstraintModel is compliant to the CROM.
+		'''
+		model=self.cm.compliant(self.crom)
+		for c in cs:
+			dangling=any( r not in self.plays_by_r for rst in self.crom.rst if (rst,c) in self.links \
+			for l in self.links[(rst,c)] for r in l )
+			for i in self.compartmentaxioms:
+				if i<10:
+					v=list(getattr(self,'violations{0}'.format(i))(self.crom,[c]))
+				elif model and not dangling:
+					v=list(getattr(self.cm,'violations{0}'.format(i))(self.crom,self,[c]))
+				else:
+					v=[]
+				self.update(i,c,v)
+		for r in rs:
+			self.update(8,r,list(self.violations8(self.crom,[r])))
+		for o in os:
+			self.update(20,o,list(self.cm.violations20(self.crom,self,[o])) if model else [])
+
+	def update(self,i,key,violations):
+		'''
+		Stores the violations of axiom i found for the given key, or removes the key if there are none.
+		'''
+		if violations:
+			self.witnesses[i][key]=violations
+		else:
+			self.witnesses[i].pop(key,None)
+
+	def violations(self):
+		'''
+		Yields the currently maintained violations (axiom,witness).
+		'''
+		for i in sorted(self.witnesses):
+			for key in self.witnesses[i]:
+				for v in self.witnesses[i][key]:
+					yield ('axiom{0}'.format(i),v)
+
+	def valid(self):
+		'''
+		Returns true iff the ConstraintModel is compliant to the CROM and the CROI is currently valid wrt. the ConstraintModel.
+		'''
+		return self.cm.compliant(self.crom) and all( len(w)==0 for w in self.witnesses.itervalues() )
+
+	def add_play(self,o,c,r,rt=None):
+		'''
+		Adds the play (o,c,r), where a new role r must be given with its type rt, and revalidates c, r, and o.
+		'''
+		if not ((o in self.n or o in self.c) and c in self.c):
+			raise ValueError("The player and compartment must be contained in the croi")
+		if r not in self.r:
+			if rt is None:
+				raise ValueError("The type of the new role must be given")
+			self.r.add(r)
+			self.type1[r]=rt
+		if (o,c,r) not in self.plays:
+			self.plays.add((o,c,r))
+			self.plays_by_r.setdefault(r,[]).append((o,c))
+			self.plays_by_c.setdefault(c,[]).append((o,r))
+			self.plays_by_crt.setdefault((c,self.type1[r]),[]).append((o,r))
+			self.rts_by_oc[(o,c)]=self.rts_by_oc.get((o,c),0) | self.bit(self.type1[c],self.type1[r])
+			self.lifted.clear()
+		self.revalidate([c],[r],[o])
+
+	def remove_play(self,o,c,r):
+		'''
+		Removes the play (o,c,r) and revalidates c, r, and o. A role that is not played anymore is removed from the croi.
+		'''
+		if (o,c,r) not in self.plays:
+			raise ValueError("The given play is not contained in the croi")
+		self.plays.remove((o,c,r))
+		for index,key,value in [ (self.plays_by_r,r,(o,c)), (self.plays_by_c,c,(o,r)), (self.plays_by_crt,(c,self.type1[r]),(o,r)) ]:
+			index[key].remove(value)
+			if not index[key]:
+				del index[key]
+		mask=0
+		for o_1,r_1 in self.plays_by_c.get(c,()):
+			if o_1==o:
+				mask|=self.bit(self.type1[c],self.type1[r_1])
+		if mask:
+			self.rts_by_oc[(o,c)]=mask
+		else:
+			del self.rts_by_oc[(o,c)]
+		# the player of r may have changed
+		self.lifted.clear()
+		if r not in self.plays_by_r:
+			self.r.discard(r)
+		self.revalidate([c],[r],[o])
+
+	def add_link(self,rst,c,r_1,r_2):
+		'''
+		Adds the link (r_1,r_2) to links(rst,c) and revalidates c.
+		'''
+		self.links.setdefault((rst,c),set()).add((r_1,r_2))
+		self.lifted.pop((rst,c),None)
+		self.degree_tables.pop((rst,c),None)
+		self.revalidate([c])
+
+	def remove_link(self,rst,c,r_1,r_2):
+		'''
+		Removes the link (r_1,r_2) from links(rst,c) and revalidates c.
+		'''
+		if (r_1,r_2) not in self.links.get((rst,c),()):
+			raise ValueError("The given link is not contained in the croi")
+		self.links[(rst,c)].remove((r_1,r_2))
+		self.lifted.pop((rst,c),None)
+		self.degree_tables.pop((rst,c),None)
+		self.revalidate([c])
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""crombenchmark.py: Benchmarks the implementation on synthetic CROMs, CROIs, and Constraint Models of increasing size."""
+
+__author__ = "Thomas Kühn"
+__copyright__ = "Copyright 2014"
+__license__ = "MIT"
+__version__ = "1.0.3"
+
+import argparse
+import math
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),'persistency'))
+
+from crompersistency import *
+
+# Generators
+
+def generate_crom(nts,cts,rts,fillers=2,seed=0):
+	'''
+	Generates a well-formed CROM with nts natural types and cts compartment types each containing rts role types,
+	where each role type is filled by up to fillers natural types and consecutive role types are related by a relationship type.
+	'''
+	rnd=random.Random(seed)
+	nt=[ "N{0}".format(i) for i in range(nts) ]
+	ct=[ "C{0}".format(i) for i in range(cts) ]
+	rt=[]
+	rst=[]
+	fills=[]
+	rel={}
+	for c in ct:
+		parts=[ "{0}.R{1}".format(c,i) for i in range(rts) ]
+		rt+=parts
+		for r in parts:
+			fills+=[ (t,c,r) for t in rnd.sample(nt,min(fillers,nts)) ]
+		for i in range(rts-1):
+			s="{0}.rst{1}".format(c,i)
+			rst.append(s)
+			rel[(s,c)]=(parts[i],parts[i+1])
+	return CROM(nt,rt,ct,rst,fills,rel)
+
+def generate_rolegroup(rts,depth):
+	'''
+	Generates a role group nested depth times over the given role types, which holds for each object playing one of them.
+	As it is no tautology, it is not pruned from the evaluation plan.
+	'''
+	if depth<=0 or len(rts)<2:
+		return RoleGroup(rts,1,len(rts))
+	return RoleGroup(rts[:1]+[generate_rolegroup(rts[1:],depth-1)],1,2)
+
+def generate_constraintmodel(crom,depth=1,roles=3):
+	'''
+	Generates a ConstraintModel compliant to the given CROM containing a role group of the given depth,
+	cardinalities bounded by the maximal number of roles per role type and compartment,
+	and an acyclic intra-relationship constraint for each relationship. All constraints can be violated in general,
+	but hold for the CROIs generated by generate_croi with the same number of roles.
+	'''
+	rolec={}
+	for ct in crom.ct:
+		parts=sorted(crom.parts(ct))
+		rolec[ct]=[ ((1,inf),parts[0]), ((1,inf),generate_rolegroup(parts,depth)) ]
+	card=dict( (k,((0,roles),(0,roles))) for k in crom.rel )
+	intra=[ (rst,ct,acyclic) for (rst,ct) in crom.rel ]
+	return ConstraintModel(rolec,card,intra,[],[])
+
+def generate_croi(crom,compartments,roles,density=0.1,seed=0):
+	'''
+	Generates a CROI compliant to the given CROM with the given number of compartments per compartment type
+	and up to roles roles per role type and compartment. Consecutive roles are linked with the given density
+	such that the lifted links are acyclic.
+	'''
+	rnd=random.Random(seed)
+	n=[]
+	r=[]
+	c=[]
+	type1={}
+	plays=[]
+	links={}
+	pool=dict( (nt,[]) for nt in crom.nt )
+	def player(nt,used):
+		candidates=[ o for o in pool[nt] if o not in used ]
+		if candidates and rnd.random()<0.5:
+			return rnd.choice(candidates)
+		o="n{0:09d}".format(len(n))
+		n.append(o)
+		type1[o]=nt
+		pool[nt].append(o)
+		return o
+	for ct in sorted(crom.ct):
+		parts=sorted(crom.parts(ct))
+		for i in range(compartments):
+			comp="c{0:09d}".format(len(c))
+			c.append(comp)
+			type1[comp]=ct
+			played=dict()
+			for rt in parts:
+				used=set()
+				played[rt]=[]
+				for j in range(rnd.randint(1,roles)):
+					o=player(rnd.choice([ t for (t,_,_) in crom.fills_by_ctrt[(ct,rt)] ]),used)
+					used.add(o)
+					role="r{0:09d}".format(len(r))
+					r.append(role)
+					type1[role]=rt
+					plays.append((o,comp,role))
+					played[rt].append((o,role))
+			for (rst,ct_1),(rt_1,rt_2) in crom.rel.iteritems():
+				if ct_1==ct:
+					links[(rst,comp)]=[ (r_1,r_2) for o_1,r_1 in played[rt_1] for o_2,r_2 in played[rt_2] \
+					if o_1<o_2 and rnd.random()<density ]
+	return CROI(n,r,c,type1,plays,links)
+
+def generate(size,depth=1,density=0.1,seed=0,naturals=4,compartments=10,parts=5,roles=3):
+	'''
+	Generates a CROM, ConstraintModel, and CROI whose number of types and instances grows linearly with size,
+	i.e., size compartment types with parts role types each and naturals*size natural types, as well as
+	the given number of compartments per compartment type with up to roles roles per role type.
+	'''
+	crom=generate_crom(naturals*size,size,parts,seed=seed)
+	cm=generate_constraintmodel(crom,depth,roles)
+	croi=generate_croi(crom,compartments,roles,density,seed)
+	return (crom,cm,croi)
+
+# Measurements
+
+def measure(f,queue):
+	'''
+	Runs f and puts its result, the elapsed time, and the increase of the peak resident memory in KB into the queue.
+	'''
+	rss=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	start=time.time()
+	result=f()
+	elapsed=time.time()-start
+	queue.put((result,elapsed,resource.getrusage(resource.RUSAGE_SELF).ru_maxrss-rss))
+
+def isolated(f):
+	'''
+	Measures f in a forked process, such that memory peaks of different measurements do not interfere.
+	'''
+	queue=multiprocessing.Queue()
+	p=multiprocessing.Process(target=measure,args=(f,queue))
+	p.start()
+	result=queue.get()
+	p.join()
+	return result
+
+def benchmark(size,depth=1,density=0.1,naturals=4,compartments=10,parts=5,roles=3):
+	'''
+	Returns the number of plays and the measurements [(operation,result,seconds,KB)] for models generated with the given parameters.
+	Each operation starts without the cached verdicts and plans of the models.
+	'''
+	crom,cm,croi=generate(size,depth,density,naturals=naturals,compartments=compartments,parts=parts,roles=roles)
+	annotation=PersistenceAnnotation(crom,[],[],sorted(crom.ct)[:1],[])
+	pcrom,pcm=transformation(crom,cm,annotation)
+	def uncached(f):
+		def run():
+			for model in (crom,cm,pcrom):
+				model.invalidate()
+			return f()
+		return run
+	operations=[ ("wellformed",lambda: crom.wellformed()),
+	             ("compliant",lambda: croi.compliant(crom)),
+	             ("validity",lambda: cm.validity(crom,croi)),
+	             ("transformation",lambda: transformation(crom,cm,annotation)[0].wellformed()),
+	             ("restriction",lambda: restriction(pcrom,croi).compliant(pcrom)) ]
+	return (len(croi.plays),[ (name,)+isolated(uncached(f)) for name,f in operations ])
+
+def main(argv=None):
+	parser=argparse.ArgumentParser(description=__doc__)
+	parser.add_argument("--sizes",default="1,2,4,8",help="comma separated list of model sizes")
+	parser.add_argument("--depth",type=int,default=1,help="nesting depth of the generated role groups")
+	parser.add_argument("--density",type=float,default=0.1,help="probability of links between related roles")
+	parser.add_argument("--naturals",type=int,default=4,help="number of natural types per model size")
+	parser.add_argument("--compartments",type=int,default=10,help="number of compartments per compartment type")
+	parser.add_argument("--parts",type=int,default=5,help="number of role types per compartment type")
+	parser.add_argument("--roles",type=int,default=3,help="maximal number of roles per role type and compartment")
+	args=parser.parse_args(argv)
+	sizes=[ int(s) for s in args.sizes.split(",") ]
+	print "{0:>6} {1:>9} {2:>15} {3:>10} {4:>10} {5:>8}".format("size","plays","operation","seconds","peak KB","scaling")
+	last={}
+	for size in sizes:
+		plays,measurements=benchmark(size,args.depth,args.density,args.naturals,args.compartments,args.parts,args.roles)
+		for name,result,seconds,peak in measurements:
+			assert result, "{0} failed for size {1}".format(name,size)
+			scaling=""
+			if name in last and last[name][1]>0 and seconds>0:
+				scaling="{0:.2f}".format(math.log(seconds/last[name][1])/math.log(float(plays)/last[name][0]))
+			last[name]=(plays,seconds)
+			print "{0:>6} {1:>9} {2:>15} {3:>10.4f} {4:>10} {5:>8}".format(size,plays,name,seconds,peak,scaling)
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,451 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""cromcompact.py: Compact representation of CROMs, CROIs, and Constraint Models over interned integer ids."""
+
+__author__ = "Thomas Kühn"
+__copyright__ = "Copyright 2014"
+__license__ = "MIT"
+__version__ = "1.0.3"
+
+import bisect
+import itertools
+from array import array
+
+try:
+	import numpy
+except ImportError:
+	numpy=None
+
+from crom import *
+
+# Compact Relations
+
+class IdMap:
+	'''
+	Class representation of a mapping from dense integer ids to integer ids stored in an array.
+	'''
+
+	def __init__(self,mapping=()):
+		'''
+		Creates a new IdMap from the given mapping or iterable of pairs.
+		'''
+		self.values=array('l')
+		items=mapping.iteritems() if isinstance(mapping,dict) else mapping
+		for k,v in items:
+			self[k]=v
+
+	def __setitem__(self,k,v):
+		if k>=len(self.values):
+			self.values.extend([-1]*(k+1-len(self.values)))
+		self.values[k]=v
+
+	def __getitem__(self,k):
+		if k in self:
+			return self.values[k]
+		raise KeyError(k)
+
+	def __contains__(self,k):
+		return isinstance(k,(int,long)) and 0 <= k < len(self.values) and self.values[k]!=-1
+
+	def get(self,k,default=None):
+		return self.values[k] if k in self else default
+
+	def iterkeys(self):
+		return ( k for k,v in enumerate(self.values) if v!=-1 )
+
+	def iteritems(self):
+		return ( (k,v) for k,v in enumerate(self.values) if v!=-1 )
+
+	def __iter__(self):
+		return self.iterkeys()
+
+	def __len__(self):
+		return sum( 1 for k in self.iterkeys() )
+
+	def __str__(self):
+		return str(dict(self.iteritems()))
+
+class Columns:
+	'''
+	Class representation of a set of integer tuples of the same arity stored column-wise in arrays.
+	The tuples are kept sorted without duplicates, such that membership is answered by bisecting the columns.
+	'''
+
+	def __init__(self,arity,tuples=()):
+		'''
+		Creates a new Columns of the given arity from the given iterable of tuples of non-negative ids.
+		'''
+		columns=tuple( array('l') for i in range(arity) )
+		for t in tuples:
+			for column,x in zip(columns,t):
+				column.append(x)
+		self.width=max( max(column) for column in columns )+1 if len(columns[0]) else 0
+		order=xrange(len(columns[0]))
+		for column in reversed(columns):
+			order=counting_sort(column,order)
+		self.columns=tuple( array('l') for i in range(arity) )
+		last=None
+		for i in order:
+			t=tuple( column[i] for column in columns )
+			if t!=last:
+				for column,x in zip(self.columns,t):
+					column.append(x)
+				last=t
+
+	def __contains__(self,t):
+		try:
+			if len(t)!=len(self.columns):
+				return False
+			lo,hi=0,len(self)
+			for column,x in zip(self.columns,t):
+				lo=bisect.bisect_left(column,x,lo,hi)
+				hi=bisect.bisect_right(column,x,lo,hi)
+				if lo==hi:
+					return False
+			return True
+		except TypeError:
+			return False
+
+	def __iter__(self):
+		return itertools.izip(*self.columns)
+
+	def __len__(self):
+		return len(self.columns[0])
+
+	def __str__(self):
+		return str(set(self))
+
+def offsets(keys,width,base=0):
+	'''
+	Returns the array of offsets of each key k with base <= k < base+width, if the given keys were sorted,
+	followed by their number.
+	'''
+	start=array('l',[0])*(width+1)
+	for k in keys:
+		start[k-base+1]+=1
+	for k in xrange(width):
+		start[k+1]+=start[k]
+	return start
+
+def counting_sort(keys,order):
+	'''
+	Returns the given order of the positions of the keys stably sorted by their key.
+	'''
+	result=array('l',[0])*len(keys)
+	if len(keys)==0:
+		return result
+	base=min(keys)
+	fill=offsets(keys,max(keys)-base+1,base)
+	for i in order:
+		result[fill[keys[i]-base]]=i
+		fill[keys[i]-base]+=1
+	return result
+
+class ColumnIndex:
+	'''
+	Class representation of an index over Columns, i.e., their positions sorted by a key column and the offsets of each key.
+	'''
+
+	def __init__(self,columns,key,width):
+		'''
+		Creates a new ColumnIndex over the given Columns for the given key column and ids less than width.
+		'''
+		keys=columns.columns[key]
+		self.width=width
+		self.order=counting_sort(keys,xrange(len(keys)))
+		self.start=offsets(keys,width)
+
+	def bounds(self,k):
+		'''
+		Returns the range (lo,hi) of the positions of the given key in order.
+		'''
+		if isinstance(k,(int,long)) and 0 <= k < self.width:
+			return (self.start[k],self.start[k+1])
+		return (0,0)
+
+	def positions(self,k):
+		'''
+		Returns the positions of the tuples with the given key.
+		'''
+		lo,hi=self.bounds(k)
+		return self.order[lo:hi]
+
+class Lookup:
+	'''
+	Class representation of a read-only mapping computing the value of each key by the given function,
+	whereby empty values count as absent keys.
+	'''
+
+	def __init__(self,f):
+		self.f=f
+
+	def value(self,k):
+		try:
+			return self.f(k)
+		except (TypeError,ValueError):
+			return None
+
+	def get(self,k,default=None):
+		v=self.value(k)
+		return v if v else default
+
+	def __getitem__(self,k):
+		v=self.value(k)
+		if not v:
+			raise KeyError(k)
+		return v
+
+	def __contains__(self,k):
+		return bool(self.value(k))
+
+class CompactCROI(CROI):
+	'''
+	Class representation of a CROI over integer ids, whose type mapping, plays-relation, links, and indexes
+	are stored in arrays.
+	'''
+
+	def __init__(self,width,n,r,c,type1,plays,links,check=True):
+		'''
+		Creates a new CompactCROI over ids less than width from the given sets of naturals, roles, compartments;
+		the type mapping; the plays-relation; and links-function. An IdMap and Columns are taken over without copying.
+		'''
+		self.n=set(n)
+		self.r=set(r)
+		self.c=set(c)
+		self.type1=type1 if isinstance(type1,IdMap) else IdMap(type1)
+		self.plays=plays if isinstance(plays,Columns) else Columns(3,plays)
+		self.width=max(width,self.plays.width)
+		self.links=dict( (k,v if isinstance(v,Columns) else Columns(2,v)) for k,v in dict(links).iteritems() )
+		if check:
+			self.check()
+		self.index()
+
+	def index(self):
+		'''
+		(Re)builds the indexes over the plays-relation and the compartments like CROI.index,
+		but as positions of the plays sorted by role and by compartment, respectively, with the offsets of each id.
+		The lookups of plays_by_r, plays_by_c, plays_by_crt, c_by_ct, and rts_by_oc are answered from these arrays.
+		'''
+		self.rt_bits=dict()
+		self.evaluators=dict()
+		self.lifted=dict()
+		self.degree_tables=dict()
+		self.by_r=ColumnIndex(self.plays,2,self.width)
+		self.by_c=ColumnIndex(self.plays,1,self.width)
+		o,c,r=self.plays.columns
+		self.plays_by_r=Lookup(lambda k: [ (o[i],c[i]) for i in self.by_r.positions(k) ])
+		self.plays_by_c=Lookup(lambda k: [ (o[i],r[i]) for i in self.by_c.positions(k) ])
+		self.plays_by_crt=Lookup(lambda k: [ (o[i],r[i]) for i in self.by_c.positions(k[0]) if self.type1.get(r[i])==k[1] ])
+		self.rts_by_oc=Lookup(lambda k: self.rts(*k))
+		cs=dict()
+		for x in self.c:
+			cs.setdefault(self.type1[x],array('l')).append(x)
+		self.c_by_ct=cs
+
+	def rts(self,o,c):
+		'''
+		Returns the bitset of the role types played by o in c by bisecting the plays in c, which are sorted by player.
+		'''
+		order=self.by_c.order
+		players,roles=self.plays.columns[0],self.plays.columns[2]
+		lo,hi=self.by_c.bounds(c)
+		while lo<hi:
+			mid=(lo+hi)//2
+			if players[order[mid]]<o:
+				lo=mid+1
+			else:
+				hi=mid
+		mask=0
+		hi=self.by_c.bounds(c)[1]
+		while lo<hi and players[order[lo]]==o:
+			mask|=self.bit(self.type1[c],self.type1[roles[order[lo]]])
+			lo+=1
+		return mask
+
+	def columns(self):
+		'''
+		Returns the plays as NumPy columns of players, compartments, and roles as well as their types.
+		'''
+		types=column(self.type1.values)
+		o,c,r=[ column(x) for x in self.plays.columns ]
+		return (o,c,r,types[o],types[c],types[r])
+
+	def violations6(croi,crom,cs=None):
+		'''
+		Yields the plays (o,c,r) violating axiom6. Without scope, the type triples are matched against the fills in bulk,
+		if NumPy is available.
+		'''
+		if numpy is None or cs is not None or len(croi.plays)==0:
+			return CROI.violations6(croi,crom,cs)
+		o,c,r,to,tc,tr=croi.columns()
+		codes=dict( (t,i) for i,t in enumerate(set( x for f in crom.fills for x in f )) )
+		k=len(codes)+1
+		# unknown types (-1 or not in fills) are mapped to the code len(codes) not occurring in fills
+		lookup=numpy.full(max([croi.width]+[ t+1 for t in codes ])+1,len(codes),dtype=numpy.int_)
+		for t,i in codes.iteritems():
+			lookup[t]=i
+		keys=(lookup[to]*k+lookup[tc])*k+lookup[tr]
+		fills=numpy.array([ (codes[t]*k+codes[ct])*k+codes[rt] for (t,ct,rt) in crom.fills ],dtype=numpy.int_)
+		bad=numpy.nonzero(~numpy.in1d(keys,fills))[0]
+		return ( (int(o[i]),int(c[i]),int(r[i])) for i in bad )
+
+	def violations7(croi,crom,cs=None):
+		'''
+		Yields the pairs of plays ((o,c,r),(o,c,r')) violating axiom7. Without scope, the plays are sorted by (o,c,type(r))
+		and adjacent duplicates are reported, if NumPy is available.
+		'''
+		if numpy is None or cs is not None or len(croi.plays)==0:
+			return CROI.violations7(croi,crom,cs)
+		o,c,r,to,tc,tr=croi.columns()
+		order=numpy.lexsort((tr,c,o))
+		o,c,r,tr=o[order],c[order],r[order],tr[order]
+		same=(o[1:]==o[:-1]) & (c[1:]==c[:-1]) & (tr[1:]==tr[:-1])
+		# a sequence of same typed roles yields a pair per successor, just as the grouping in CROI.violations7
+		first=numpy.maximum.accumulate(numpy.where(numpy.concatenate(([True],~same)),numpy.arange(len(o)),0))
+		bad=numpy.nonzero(same)[0]+1
+		return ( ((int(o[i]),int(c[i]),int(r[first[i]])),(int(o[i]),int(c[i]),int(r[i]))) for i in bad )
+
+	def violations8(croi,crom,rs=None):
+		'''
+		Yields the roles violating axiom8 together with their plays. Without scope, the plays per role are counted in bulk,
+		if NumPy is available.
+		'''
+		if numpy is None or rs is not None:
+			return CROI.violations8(croi,crom,rs)
+		roles=numpy.array(sorted(croi.r),dtype=numpy.int_)
+		counts=numpy.bincount(column(croi.plays.columns[2]),minlength=croi.width+1)
+		bad=roles[counts[roles]!=1] if len(roles) else roles
+		return ( (r,[ (o,c,r) for o,c in croi.plays_by_r.get(r,()) ]) for r in ( int(x) for x in bad ) )
+
+def column(a):
+	'''
+	Returns the given integer array as NumPy array without copying.
+	'''
+	if len(a)==0:
+		return numpy.zeros(0,dtype=numpy.int_)
+	return numpy.frombuffer(a,dtype=numpy.int_)
+
+# Interning
+
+class Interner:
+	'''
+	Class representation of a bijection between the names of types and instances and dense integer ids.
+	'''
+
+	def __init__(self):
+		'''
+		Creates a new empty Interner.
+		'''
+		self.ids=dict()
+		self.names=[]
+
+	def id(self,name):
+		'''
+		Returns the id of the given name, assigning the next free id to unknown names.
+		'''
+		if name not in self.ids:
+			self.ids[name]=len(self.names)
+			self.names.append(name)
+		return self.ids[name]
+
+	def rolegroup(self,a,f):
+		'''
+		Returns the given RoleGroup, QuantifiedGroup, Quantification, or role type with all names mapped by f.
+		'''
+		if isinstance(a,RoleGroup):
+			return RoleGroup([ self.rolegroup(b,f) for b in a.rolegroups ],a.lower,a.upper)
+		elif isinstance(a,QuantifiedGroup):
+			return QuantifiedGroup([ self.rolegroup(b,f) for b in a.qrgs ],a.lower,a.upper)
+		elif isinstance(a,Quantification):
+			return Quantification(f(a.ct),a.lower,a.upper,self.rolegroup(a.rolegroup,f))
+		else:
+			return f(a)
+
+	def intern_crom(self,crom):
+		'''
+		Returns the given CROM over interned ids.
+		'''
+		i=self.id
+		return CROM([ i(t) for t in crom.nt ],[ i(t) for t in crom.rt ],[ i(t) for t in crom.ct ],[ i(t) for t in crom.rst ],
+		[ (i(t),i(ct),i(rt)) for (t,ct,rt) in crom.fills ],
+		dict( ((i(rst),i(ct)),(i(rt_1),i(rt_2))) for (rst,ct),(rt_1,rt_2) in crom.rel.iteritems() ),False)
+
+	def intern_croi(self,croi):
+		'''
+		Returns the given CROI as CompactCROI over interned ids.
+		'''
+		return self.compact_croi(croi.n,croi.r,croi.c,croi.type1,croi.plays,croi.links)
+
+	def compact_croi(self,n,r,c,type1,plays,links):
+		'''
+		Returns a CompactCROI over interned ids from the given iterables of naturals, roles, compartments;
+		the type mapping as dict or pairs (x,t); the plays (o,c,r); and the links as dict or pairs ((rst,c),[(r_1,r_2),...]).
+		The iterables are consumed one by one, such that the instance is never held with its names.
+		'''
+		i=self.id
+		n=set( i(x) for x in n )
+		r=set( i(x) for x in r )
+		c=set( i(x) for x in c )
+		type1=IdMap( (i(x),i(t)) for x,t in (type1.iteritems() if isinstance(type1,dict) else type1) )
+		plays=Columns(3,( (i(o),i(c_1),i(r_1)) for o,c_1,r_1 in plays ))
+		links=dict( ((i(rst),i(c_1)),Columns(2,( (i(r_1),i(r_2)) for r_1,r_2 in pairs )))
+		            for (rst,c_1),pairs in (links.iteritems() if isinstance(links,dict) else links) )
+		return CompactCROI(len(self.names),n,r,c,type1,plays,links,False)
+
+	def intern_constraintmodel(self,cm):
+		'''
+		Returns the given ConstraintModel over interned ids.
+		'''
+		i=self.id
+		return ConstraintModel(
+		dict( (i(ct),[ (crd,self.rolegroup(a,i)) for crd,a in cs ]) for ct,cs in cm.rolec.iteritems() ),
+		dict( ((i(rst),i(ct)),crd) for (rst,ct),crd in cm.card.iteritems() ),
+		[ (i(rst),i(ct),f) for (rst,ct,f) in cm.intra ],
+		[ (i(rst_1),i(ct),e,i(rst_2)) for (rst_1,ct,e,rst_2) in cm.inter ],
+		[ self.rolegroup(a,i) for a in cm.grolec ])
+
+	def name(self,x):
+		'''
+		Returns the given id, or tuple, list, set, or role group of ids, with all ids replaced by their names.
+		'''
+		if isinstance(x,(int,long)) and not isinstance(x,bool):
+			return self.names[x]
+		elif isinstance(x,tuple):
+			return tuple( self.name(y) for y in x )
+		elif isinstance(x,list):
+			return [ self.name(y) for y in x ]
+		elif isinstance(x,(set,frozenset)):
+			return set( self.name(y) for y in x )
+		elif isinstance(x,(RoleGroup,QuantifiedGroup,Quantification)):
+			return self.rolegroup(x,self.name)
+		return x
+
+	def violation(self,v):
+		'''
+		Returns the given violation (axiom,witness) with all ids replaced by their names,
+		while keeping cardinalities and counts.
+		'''
+		axiom,witness=v
+		nm=self.name
+		if axiom in ('axiom10','axiom15'):
+			return (axiom,(nm(witness[0]),(witness[1][0],nm(witness[1][1]))))
+		elif axiom=='axiom14':
+			return (axiom,(nm(witness[0]),(witness[1][0],nm(witness[1][1])),witness[2]))
+		elif axiom=='axiom16':
+			return (axiom,(nm(witness[0]),witness[1],nm(witness[2]),witness[3]))
+		elif axiom=='axiom17':
+			return (axiom,(nm(witness[0]),witness[1]))
+		return (axiom,nm(witness))
+
+def compact_report(crom,croi=None,cm=None,limit=None):
+	'''
+	Lazily yields the violations (axiom,witness) of the given models, like report, but evaluates the axioms
+	on their compact representation over interned ids and returns the witnesses with the original names.
+	'''
+	interner=Interner()
+	pcrom=interner.intern_crom(crom)
+	pcroi=interner.intern_croi(croi) if croi is not None else None
+	pcm=interner.intern_constraintmodel(cm) if cm is not None else None
+	for v in report(pcrom,pcroi,pcm,limit):
+		yield interner.violation(v)
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+# -*- coding: UTF-8 -*-
+
+"""cromcompacttest.py: Encompasses test cases for the compact representation over interned ids."""
+
+__author__ = "Thomas Kühn"
+__copyright__ = "Copyright 2014"
+__license__ = "MIT"
+__version__ = "1.0.0"
+
+import itertools
+import cromcompact
+from cromcompact import *
+from crombenchmark import generate,isolated
+
+print "Testing... Compact Relations"
+
+m=IdMap({0:3,2:1})
+assert( 0 in m and 1 not in m and 'a' not in m and m[2]==1 and m.get(1,5)==5 and sorted(m)==[0,2] )
+p=Columns(3,[(3,3,3),(0,1,2),(0,1,1),(0,1,2)])
+assert( len(p)==3 and (3,3,3) in p and (1,0,2) not in p and (4,0,0) not in p and (0,1) not in p and 'a' not in p )
+assert( list(p)==[(0,1,1),(0,1,2),(3,3,3)] and len(Columns(2))==0 and (0,0) not in Columns(2) )
+
+print "Testing... Interning"
+
+bank=CROM(["Person","Account"],["Customer","CA"],["Bank"],["own_ca"],
+          [("Person","Bank","Customer"),("Account","Bank","CA")],{("own_ca","Bank"):("Customer","CA")})
+c_bank=ConstraintModel({"Bank":[((1,inf),"Customer")]},{("own_ca","Bank"):((1,1),(0,inf))},
+                       [("own_ca","Bank",irreflexive)],[],[])
+bank1=CROI(["Peter","Account_1"],["Cu_1","Ca_1","Ca_2"],["bank"],
+           {"Peter":"Person","Account_1":"Account","Cu_1":"Customer","Ca_1":"CA","Ca_2":"CA","bank":"Bank"},
+           [("Peter","bank","Cu_1"),("Account_1","bank","Ca_1"),("Account_1","bank","Ca_2")],
+           {("own_ca","bank"):[("Cu_1","Ca_1")]})
+
+interner=Interner()
+pbank=interner.intern_crom(bank)
+pbank1=interner.intern_croi(bank1)
+assert( pbank.wellformed() and pbank1.player(interner.id("Cu_1"))==interner.id("Peter") )
+assert( list(compact_report(bank,bank1,c_bank))==[ ('axiom7',(("Account_1","bank","Ca_1"),("Account_1","bank","Ca_2"))) ] or \
+        list(compact_report(bank,bank1,c_bank))==[ ('axiom7',(("Account_1","bank","Ca_2"),("Account_1","bank","Ca_1"))) ] )
+assert( list(compact_report(bank,CROI(bank1.n,["Cu_1","Ca_1"],bank1.c,bank1.type1,
+        [("Peter","bank","Cu_1"),("Account_1","bank","Ca_1")],{("own_ca","bank"):[]}),c_bank))== \
+        [ ('axiom16',(("own_ca","bank"),'pred',"Ca_1",0)) ] )
+
+for size in [1,2]:
+	crom,cm,croi=generate(size)
+	interner=Interner()
+	pcrom,pcm,pcroi=interner.intern_crom(crom),interner.intern_constraintmodel(cm),interner.intern_croi(croi)
+	assert( pcm.validity(pcrom,pcroi) and cm.validity(crom,croi) )
+	assert( len(pcroi.plays)==len(croi.plays) and set( interner.name(t) for t in pcroi.plays )==croi.plays )
+	# the array-backed lookups agree with the indexes of a CROI over the same ids
+	q=CROI(pcroi.n,pcroi.r,pcroi.c,dict(pcroi.type1.iteritems()),list(pcroi.plays),pcroi.links,False)
+	keys=list(pcroi.r)+list(pcroi.c)+[ (c,rt) for c in pcroi.c for rt in pcrom.rt ]+[ (o,c) for o in pcroi.o() for c in pcroi.c ]+[-1,'a']
+	for index in ['plays_by_r','plays_by_c','plays_by_crt']:
+		assert( all( sorted(getattr(pcroi,index).get(k,()))==sorted(getattr(q,index).get(k,())) for k in keys ) )
+	assert( all( (k in pcroi.rts_by_oc)==(k in q.rts_by_oc) for k in keys ) )
+	assert( all( pcroi.rts_by_oc[(o_1,c)]==reduce(lambda x,y: x|y,[ pcroi.bit(pcroi.type1[c],pcroi.type1[r])
+	        for o,r in pcroi.plays_by_c[c] if o==o_1 ]) for o_1,c,r in pcroi.plays ) )
+	assert( all( sorted(pcroi.c_by_ct.get(ct,()))==sorted(q.c_by_ct.get(ct,())) for ct in pcrom.ct ) )
+
+print "Testing... Vectorized Compliance"
+
+for backend in [numpy,None]:
+	cromcompact.numpy=backend
+	for size in [1,3]:
+		crom,cm,croi=generate(size)
+		plays=list(croi.plays)
+		o,c,r=plays[0]
+		c_1=[ x for x in croi.c if x!=c ][0]
+		# a second role of the same type for o in c, a role played twice, and an ill-typed play
+		broken=CROI(croi.n,croi.r|set(["x","y"]),croi.c,dict(croi.type1,x=croi.type1[r],y="Unknown"),
+		            plays+[(o,c,"x"),(o,c_1,r),(o,c,"y")],croi.links,False)
+		for m in [croi,broken]:
+			interner=Interner()
+			pcrom,pcroi=interner.intern_crom(crom),interner.intern_croi(m)
+			for i in [6,7,8]:
+				v=sorted( interner.name(w) for w in getattr(pcroi,'violations{0}'.format(i))(pcrom) )
+				e=sorted( interner.name(w) for w in getattr(CROI,'violations{0}'.format(i))(pcroi,pcrom) )
+				assert( (v==e) if i!=7 else (len(v)==len(e)) )
+			assert( pcroi.compliant(pcrom)==m.compliant(crom)==(m is croi) )
+
+print "Testing... Compact Memory"
+
+def names(size):
+	'''
+	Yields the naturals, roles, compartments, type mapping, plays, and links of a CROI with size plays one by one.
+	'''
+	n=( "n{0}".format(i) for i in xrange(size/4) )
+	r=( "r{0}".format(i) for i in xrange(size) )
+	c=( "c{0}".format(i) for i in xrange(size/40) )
+	type1=itertools.chain(( ("n{0}".format(i),"N") for i in xrange(size/4) ),( ("r{0}".format(i),"R{0}".format(i%5)) for i in xrange(size) ),
+	                      ( ("c{0}".format(i),"C") for i in xrange(size/40) ))
+	plays=( ("n{0}".format(i%(size/4)),"c{0}".format(i%(size/40)),"r{0}".format(i)) for i in xrange(size) )
+	links=( (("rst","c{0}".format(j)),[ ("r{0}".format(i),"r{0}".format(i+1)) for i in xrange(j*40,j*40+39,3) ]) for j in xrange(size/40) )
+	return n,r,c,type1,plays,links
+
+def plain():
+	n,r,c,type1,plays,links=names(40000)
+	return len(CROI(list(n),list(r),list(c),dict(type1),list(plays),dict(links),False).plays)
+
+def compact():
+	return len(Interner().compact_croi(*names(40000)).plays)
+
+(p,t_1,kb_plain),(q,t_2,kb_compact)=isolated(plain),isolated(compact)
+assert( p==q==40000 and kb_compact<kb_plain )
+
+print "Test completed successfully"
@@ -8,6 +8,7 @@ __copyright__ = "Copyright 2014"
 __license__ = "MIT"
 __version__ = "1.0.0"
 
+import crom
 from crom import *
 
 print "Testing... Basic Defintions"
@@ -29,6 +30,17 @@ transitive_closuretest=[ ([],set([])), ([(1,2),(2,3)],set([(1,2),(2,3),(1,3)])),
 for s,e in transitive_closuretest:
 	assert transitive_closure(s)==e, "Case transitive_closure({0})!={1}".format(s,e)
 
+cycletests=[ ([],False), ([(1,1)],True), ([(1,2),(2,3),(1,3)],False), ([(1,2),(2,3),(3,1)],True),
+             ([(1,2),(3,4),(4,5),(5,3)],True), ([(1,2),(1,3),(2,4),(3,4)],False) ]
+for s,e in cycletests:
+	assert has_cycle(s)==e, "Case has_cycle({0})!={1}".format(s,e)
+	assert acyclic(set(),set(),set(s))==(not e), "Case acyclic({0})!={1}".format(s,not e)
+
+intratests=[ (set([(1,1),(2,2)]),True), (set([(1,1),(1,2)]),True), (set([(1,2),(2,1)]),False), (set(),True) ]
+for s,e in intratests:
+	assert cyclic(set(),set(),s)==e, "Case cyclic({0})!={1}".format(s,e)
+	assert cyclic(set(),set(),s)==all( (x,x) in s for x,y in transitive_closure(s) )
+
 # Test Cases for CROM
 
 print "Testing... CROM"
@@ -62,6 +74,29 @@ for t,a1,a2,a3,a4,a5 in cromtests:
 	assert(t.axiom4()==a4)
 	assert(t.axiom5()==a5)
 	assert(t.wellformed()==(a1 and a2 and a3 and a4 and a5))
+
+assert(test1.parts(4)==set([2,3]) and test3.parts(5)==set())
+assert(test21.fills_by_rt[3]==set([(1,4,3),(1,5,3)]) and test21.fills_by_ctrt[(5,3)]==set([(1,5,3)]))
+
+structuretests=[ ([1],[2,3],[4],['a'],[(2,4,3)],{}),
+                 ([1],[2,3],[4],['a'],[(1,4,5)],{}),
+                 ([1],[2,3],[4],['a'],[],{('b',4):(2,3)}),
+                 ([1],[2,3],[4],['a'],[],{('a',4):(2,1)}),
+                 ([1],[1,3],[4],['a'],[],{}) ]
+for nt,rt,ct,rst,fills,rel in structuretests:
+	failed=False
+	try:
+		CROM(nt,rt,ct,rst,fills,rel)
+	except AssertionError:
+		failed=True
+	assert(failed)
+	deferred=CROM(nt,rt,ct,rst,fills,rel,check=False)
+	failed=False
+	try:
+		deferred.check()
+	except AssertionError:
+		failed=True
+	assert(failed)
 	
 # Test Cases for CROI
 
@@ -109,6 +144,288 @@ for t,a6,a7,a8,a9 in croitests:
 	assert(t.axiom9(test1)==a9)
 	assert(t.compliant(test1)==(a6 and a7 and a8 and a9 ))
 
+for plays in [ [(2,4,3)], [(1,1,3)], [(1,4,1)] ]:
+	failed=False
+	try:
+		CROI([1],[2,3],[4],{1:1,2:2,3:3,4:4},plays,{})
+	except AssertionError:
+		failed=True
+	assert(failed)
+	CROI([1],[2,3],[4],{1:1,2:2,3:3,4:4},plays,{},check=False)
+
+untyped=CROI([1],[2],[4],{1:1,4:4},[(1,4,2)],{},check=False)
+failed=False
+try:
+	untyped.check()
+except AssertionError:
+	failed=True
+assert(failed)
+
+assert(list(test10.violations7(test1)) in [ [((1,4,2),(1,4,3))], [((1,4,3),(1,4,2))] ])
+assert([ (r,sorted(ps)) for r,ps in test11.violations8(test1) ]==[ (2,[(1,4,2),(1,5,2)]) ])
+assert(list(test15.violations8(test1))==[(6,[])])
+linked=CROI([1],[2,3],[7,8],{1:1,2:2,3:3,7:4,8:4},[(1,7,2),(1,7,3)],{('a',7):[(2,3)],('z',7):[(3,2)],('a',9):[(3,2)]})
+assert(linked.compliant(test1))
+linked.links[('a',7)]=[(2,3),(3,2)]
+linked.links[('a',8)]=[(2,3)]
+assert(sorted(linked.violations9(test1))==[ (('a',7),(3,2)), (('a',8),(2,3)) ])
+assert(list(linked.violations9(test1,[8]))==[ (('a',8),(2,3)) ])
+
+print "Testing... Violation reports"
+
+assert(list(report(test1))==[])
+assert(sorted(report(test7))==sorted([ ('axiom1',(2,set())), ('axiom1',(4,set())), ('axiom2',6),
+	('axiom3','b'), ('axiom4',(('a',5),(2,2))), ('axiom5',(('a',5),2)), ('axiom5',(('a',5),2)) ]))
+assert(set( a for a,v in report(test1,test15) )==set(['axiom6','axiom7','axiom8','axiom9']))
+assert(len(list(report(test7,limit=1)))==5)
+reportcm=ConstraintModel({},{ ('a',4):((2,2),(1,1)) },[],[],[])
+assert(list(report(test1,test8,reportcm))==[ ('axiom16',(('a',4),'pred',3,1)) ])
+assert(list(report(test1,test9,reportcm))==[ ('axiom6',(1,4,2)) ])
+
+print "Testing... Parallel validation"
+
+assert(reportcm.parallel_violations(test1,test8,2)==[ ('axiom16',(('a',4),'pred',3,1)) ])
+assert(reportcm.validity(test1,test8,processes=2)==False)
+assert(ConstraintModel({},{ ('a',4):((1,1),(1,1)) },[],[],[]).validity(test1,test8,processes=2)==True)
+# without forking, e.g., under the spawn start method, the chunks are checked serially
+crom.forking=lambda: False
+assert(reportcm.parallel_violations(test1,test8,2)==[ ('axiom16',(('a',4),'pred',3,1)) ] and crom._snapshot is None)
+crom.forking=forking
+
+print "Testing... Incremental validation"
+
+inccm=ConstraintModel({4: [((1,1),2)]},{ ('a',4):((1,1),(1,1)) },[('a',4,irreflexive)],[],[])
+inc=IncrementalCROI(test1,inccm,[1,5],[],[4],{1:1,4:4,5:1},[],{})
+steps=[ (inc.add_play,(1,4,2,2),False), (inc.add_play,(5,4,3,3),False), (inc.add_link,('a',4,2,3),True),
+        (inc.add_play,(5,4,6,2),False), (inc.remove_play,(5,4,6),True), (inc.add_link,('a',4,3,2),False),
+        (inc.remove_link,('a',4,3,2),True), (inc.remove_play,(5,4,3),False) ]
+for f,args,e in steps:
+	f(*args)
+	snapshot=CROI(inc.n,inc.r,inc.c,inc.type1,inc.plays,inc.links)
+	assert(inc.valid()==e)
+	assert(inccm.validity(test1,snapshot)==e)
+	assert(set( a for a,v in inc.violations() )==set( a for a,v in report(test1,snapshot,inccm) ))
+assert(6 not in inc.r and 3 not in inc.r)
+try:
+	inc.add_play('ghost',4,7,2)
+	assert(False)
+except ValueError:
+	pass
+snapshot=CROI(inc.n,inc.r,inc.c,inc.type1,inc.plays,inc.links)
+assert(7 not in inc.r and 7 not in inc.type1 and inc.valid()==inccm.validity(test1,snapshot))
+
+print "Testing... CROI indexes"
+
+assert(sorted(test11.o_c(4))==[1,1])
+assert(test11.o_c(6)==[])
+assert(test11.o_c_rt(4,2)==[1] and test11.r_c_rt(4,3)==[3])
+assert(test11.r_c_rt(5,3)==[])
+assert(test11.C_ct(4)==set([4,5]) and test11.C_ct(2)==set())
+assert(test8.player(3)==1)
+try:
+	test8.player(5)
+	assert(False)
+except ValueError:
+	pass
+
+print "Testing... Cached verdicts"
+
+cached=CROM([1],[2,3],[4],['a'],[(1,4,2),(1,4,3)],{('a',4):(2,3)})
+cachedcm=ConstraintModel({},{},[],[],[])
+assert(cachedcm.compliant(cached) and cachedcm.verdicts[cached] and cached.verdicts['wellformed'])
+cached.fills=frozenset([(1,4,2)])
+assert(cached.wellformed() and cachedcm.compliant(cached))
+cached.invalidate()
+assert(not cached.wellformed() and not cachedcm.compliant(cached))
+cachedcm.invalidate()
+assert(not cachedcm.compliant(cached))
+
+print "Testing... Compiled role groups"
+
+def naive(a,croi,o,c):
+	if isinstance(a,RoleGroup):
+		return int(a.lower <= sum( naive(b,croi,o,c) for b in a.rolegroups ) <= a.upper)
+	return int(any( (o,c,r) in croi.plays for r in croi.r if croi.type1[r]==a ))
+
+groups=[ 2, 5, RoleGroup([2,3],2,2), RoleGroup([RoleGroup([2,RoleGroup([3],1,2)],0,1),2],1,1),
+         RoleGroup([],0,0), RoleGroup([],1,1), RoleGroup([2],0,0), RoleGroup([5],0,0), RoleGroup([2,3,5],1,2) ]
+for croi in [test8,test10,test11,test12,test15]:
+	for a in groups:
+		for o in croi.o():
+			for c in croi.c:
+				assert(evaluate(a,croi,o,c)==naive(a,croi,o,c))
+assert(test11.rts_by_oc[(1,4)]==test11.bit(4,2)|test11.bit(4,3) and test11.rts_by_oc[(1,5)]==test11.bit(4,2))
+compiled=IncrementalCROI(test1,inccm,[1,5],[],[4],{1:1,4:4,5:1},[],{})
+for f,args in [ (compiled.add_play,(1,4,2,2)), (compiled.add_play,(1,4,3,3)), (compiled.add_play,(1,4,6,2)),
+                (compiled.remove_play,(1,4,2)), (compiled.remove_play,(1,4,3)), (compiled.remove_play,(1,4,6)) ]:
+	f(*args)
+	for a in groups:
+		assert(evaluate(a,compiled,1,4)==naive(a,compiled,1,4))
+assert((1,4) not in compiled.rts_by_oc)
+
+print "Testing... Hash-consed role groups"
+
+import pickle
+shared=RoleGroup([2,RoleGroup([3],1,2)],0,inf)
+assert(shared is RoleGroup([RoleGroup([3],1,2.0),2],0,inf) and shared.upper==inf)
+assert(shared is not RoleGroup([2,RoleGroup([3],1,2)],0,1) and RoleGroup([2],0,1) is not QuantifiedGroup([2],0,1))
+assert(len(set([ shared, RoleGroup([2,RoleGroup([3],1,2)],0,inf) ]))==1)
+assert(shared.atoms==frozenset([2,3]) and atoms(shared) is atoms(shared) and atoms(2)==set([2]))
+assert(pickle.loads(pickle.dumps(shared,2)) is shared and pickle.loads(pickle.dumps(shared)) is shared)
+for f in [ lambda: setattr(shared,'lower',1), lambda: delattr(shared,'upper'), lambda: setattr(shared,'other',1) ]:
+	try:
+		f()
+		assert(False)
+	except AttributeError:
+		pass
+try:
+	RoleGroup([2],2,1)
+	assert(False)
+except ValueError:
+	pass
+quantified=QuantifiedGroup([Quantification(4,1,inf,RoleGroup([3],1,2)),Quantification(4,0,0,RoleGroup([5],1,1))],2,2)
+assert(quantified is QuantifiedGroup([Quantification(4,0,0,RoleGroup([5],1,1)),Quantification(4,1,inf,RoleGroup([3],1,2))],2,2))
+assert(quantified.atoms==frozenset([3,5]) and unbound(test1,quantified)==set([5]))
+assert(str(quantified).startswith("QuantifiedGroup("))
+one=RoleGroup([2],1,1)
+twice=RoleGroup([one,one],2,2)
+assert(twice is RoleGroup([RoleGroup([2],1,1),RoleGroup([2],1,1)],2,2) and twice is not RoleGroup([one],2,2))
+assert(twice.rolegroups==(one,one) and evaluate(twice,test11,1,4)==1 and evaluate(RoleGroup([one],2,2),test11,1,4)==0)
+assert(RoleGroup([2,2],2,2) is RoleGroup([2],2,2) and evaluate(RoleGroup([2,2],2,2),test11,1,4)==0)
+assert(RoleGroup([one,3,one],1,2) is RoleGroup([3,one,one],1,2) and value_range(twice)==(0,1))
+q=Quantification(4,1,1,RoleGroup([3],1,1))
+assert(QuantifiedGroup([q,q],2,2) is not QuantifiedGroup([q],2,2) and evaluateQ(QuantifiedGroup([q,q],2,2),test11,1)==1)
+assert(batch_evaluateQ(QuantifiedGroup([q,q],2,2),test11)==(0,{1:1}) and evaluateQ(QuantifiedGroup([q],2,2),test11,1)==0)
+assert(evaluateQ(quantified,test11,1)==1 and evaluateQ(quantified,test11,4)==0)
+
+print "Testing... Batched global role constraints"
+
+quantifications=[ quantified, Quantification(4,0,1,RoleGroup([2],0,0)), Quantification(4,2,2,2), Quantification(7,0,0,2),
+                  QuantifiedGroup([Quantification(4,0,1,RoleGroup([2,3],0,1)),quantified],1,2) ]
+for croi in [test8,test8b,test10,test11,test11b,test12,test15]:
+	memo=dict()
+	for a in quantifications:
+		d,v=batch_evaluateQ(a,croi,memo)
+		assert(all( v.get(o,d)==evaluateQ(a,croi,o) for o in croi.o() ))
+	globalcm=ConstraintModel({},{},[],[],quantifications)
+	assert(sorted(globalcm.violations20(test1,croi))==sorted(globalcm.violations20(test1,croi,croi.o())))
+assert(batch_evaluateQ(Quantification(4,0,1,RoleGroup([2],0,0)),test11)==(0,{1:1}))
+try:
+	batch_evaluateQ(RoleGroup([2],0,0),test11)
+	assert(False)
+except ValueError:
+	pass
+
+print "Testing... Lifted links"
+
+assert(test8.overline_links('a',4)==set([(1,1)]) and test8.overline_links('a',4) is test8.lifted[('a',4)])
+lifted=IncrementalCROI(test1,inccm,[1,5],[2,3],[4],{1:1,2:2,3:3,4:4,5:1},[(1,4,2),(5,4,3)],{('a',4):[(2,3)]})
+assert(lifted.overline_links('a',4)==set([(1,5)]))
+lifted.add_link('a',4,3,2)
+assert(lifted.overline_links('a',4)==set([(1,5),(5,1)]))
+lifted.remove_play(5,4,3)
+lifted.add_play(1,4,3,3)
+assert(lifted.overline_links('a',4)==set([(1,1)]) and not lifted.valid())
+assert(test8.overline_links('b',4)==set())
+twocrom=CROM([1],[2,3],[4],['a','b'],[(1,4,2),(1,4,3)],{('a',4):(2,3),('b',4):(2,3)})
+emptycm=ConstraintModel({},{},[],[('a',4,exclusion,'b'),('a',4,implication,'b')],[])
+empty=IncrementalCROI(twocrom,emptycm,[1],[],[4],{1:1,4:4},[],{})
+assert(empty.valid() and emptycm.validity(twocrom,test8b))
+assert(list(report(twocrom,test8,emptycm))==[ ('axiom19',(('a',4,'b'),set([(1,1)]))) ])
+empty.add_play(1,4,2,2)
+empty.add_play(1,4,3,3)
+empty.add_link('a',4,2,3)
+assert(list(empty.violations())==[ ('axiom19',(('a',4,'b'),set([(1,1)]))) ])
+
+print "Testing... Link degrees"
+
+assert(test8.degrees('a',4)==({3:1},{2:1}) and test8.degrees('a',5)==({},{}))
+assert(lifted.degrees('a',4)==({3:1,2:1},{2:1,3:1}))
+lifted.add_link('a',4,2,2)
+assert(lifted.degrees('a',4)==({3:1,2:2},{2:2,3:1}))
+for croi in [test8,test12,lifted]:
+	for (rst,c) in croi.links:
+		indegree,outdegree=croi.degrees(rst,c)
+		assert(all( indegree.get(r,0)==len(croi.pred(rst,c,r)) and outdegree.get(r,0)==len(croi.succ(rst,c,r)) for r in croi.r ))
+
+print "Testing... Evaluation plans"
+
+plannedcm=ConstraintModel({4:[((1,1),2)],5:[((0,1),3)]},{('a',4):((1,1),(0,1)),('b',4):((0,0),(0,0))},
+	[('a',4,irreflexive)],[('a',4,exclusion,'b'),('b',4,implication,'a')],[])
+plan=plannedcm.plan(test1)
+assert(plan is plannedcm.plan(test1) and plannedcm.plans.keys()==[test1])
+assert(plan.rolec=={4:[((1,1),2)]} and plan.card=={4:[('a',(2,3),((1,1),(0,1)),(True,True))]})
+assert(plan.intra=={4:[('a',(2,3),irreflexive)]})
+assert(plan.inter=={(4,exclusion):[('a','b')],(4,implication):[('b','a')]})
+plannedcm.invalidate()
+assert(plannedcm.plans=={} and plannedcm.plan(test1) is not plan)
+
+print "Testing... Constraint simplification"
+
+assert(value_range(2)==(0,1) and value_range(RoleGroup([2,3],0,2))==(1,1) and value_range(RoleGroup([2,3],3,4))==(0,0))
+assert(value_range(RoleGroup([RoleGroup([2,3],0,2),RoleGroup([2],2,2)],1,1))==(1,1))
+assert(value_range(RoleGroup([2,3],1,inf))==(0,1))
+tautology=RoleGroup([2,3],0,2)
+prunedcm=ConstraintModel({4:[((0,inf),2),((0,inf),tautology),((0,inf),RoleGroup([2,3],1,1)),((1,1),3),((0,2),3),((1,1),3)]},
+	{('a',4):((0,inf),(0,inf))},[],[],[])
+plan=prunedcm.plan(test1)
+assert(plan.rolec=={4:[((0,inf),RoleGroup([2,3],1,1)),((1,1),3)]} and plan.card=={})
+assert(sorted( (kind,key,reason) for kind,key,constraint,reason in plan.pruned )==[ ('card',('a',4),'unbounded'),
+	('rolec',4,'subsumed'), ('rolec',4,'subsumed'), ('rolec',4,'unbounded'), ('rolec',4,'unbounded') ])
+assert(plan.savings(test11)=={'axiom14':8,'axiom15':7,'axiom16':3})
+assert(ConstraintPlan(prunedcm,test1,False).pruned==[] and len(ConstraintPlan(prunedcm,test1,False).rolec[4])==6)
+partialcm=ConstraintModel({},{('a',4):((0,inf),(1,1))},[],[],[])
+assert(partialcm.plan(test1).pruned==[ ('card',('a',4),((0,inf),(1,1)),'unbounded pred') ])
+assert(partialcm.plan(test1).card=={4:[('a',(2,3),((0,inf),(1,1)),(False,True))]})
+assert(ConstraintPlan(partialcm,test1,False).card=={4:[('a',(2,3),((0,inf),(1,1)),(True,True))]})
+assert(ConstraintPlan(prunedcm,test1,False).card=={4:[('a',(2,3),((0,inf),(0,inf)),(True,True))]})
+runtime=''.join(['r','t'])
+assert(runtime is not 'rt')
+namedplan=ConstraintPlan(ConstraintModel({'ct':[((1,1),'rt'),((0,5),runtime)]},{},[],[],[]),
+	CROM(['n'],['rt'],['ct'],[],[('n','ct','rt')],{}))
+assert(namedplan.rolec=={'ct':[((1,1),'rt')]} and namedplan.pruned==[ ('rolec','ct',((0,5),runtime),'subsumed') ])
+assert(partialcm.plan(test1).savings(test8)=={'axiom14':0,'axiom15':0,'axiom16':1})
+for croi in [test8,test10,test11,test12,test15]:
+	for scm in [prunedcm,partialcm]:
+		unplanned=ConstraintModel(scm.rolec,scm.card,scm.intra,scm.inter,scm.grolec)
+		unplanned.plans[test1]=ConstraintPlan(unplanned,test1,False)
+		for i in [14,15,16]:
+			# pruning only drops witnesses of duplicate or subsumed constraints
+			planned=list(getattr(scm,'violations{0}'.format(i))(test1,croi))
+			full=list(getattr(unplanned,'violations{0}'.format(i))(test1,croi))
+			assert(all( v in full for v in planned ) and (len(planned)==0)==(len(full)==0))
+
+print "Testing... Intra-relationship constraints"
+
+import random
+rnd=random.Random(0)
+backends=[crom.numpy,None]
+naivetotal=lambda a,b,r: all( x==y or (x,y) in r or (y,x) in r for x in (a|b) for y in (a|b) )
+for n,p in [ (3,0.5), (5,0.9), (80,0.3), (80,0.995), (70,1.0) ]:
+	for i in range(10):
+		a=set(range(n/2))
+		b=set(range(n/2,n))
+		r=set( (x,y) for x in range(n) for y in range(n) if rnd.random()<p )
+		expected=[ naivetotal(a,b,r), all( (x,x) in r for x in (a|b) ), not(any( x==y for x,y in r)),
+		           all( (x,x) in r for x,y in r ), not has_cycle(r) ]
+		for backend in backends:
+			crom.numpy=backend
+			assert([ f(a,b,r) for f in [total,reflexive,irreflexive,cyclic,acyclic] ]==expected)
+			assert(total_pairs(a,b,r)==expected[0])
+crom.numpy=backends[0]
+assert(total(set([1,2]),set([3]),set([(1,2),(3,1),(2,3),(4,1)])) and not total(set([1,2]),set([3]),set([(1,2),(2,1)])))
+assert(intra_constraint('acyclic') is acyclic and intra_constraint(acyclic) is acyclic and intra_constraints['total'] is total)
+try:
+	intra_constraint('unknown')
+	assert(False)
+except ValueError:
+	pass
+functional=register('functional',lambda a,b,r: len(set( x for x,y in r ))==len(r),"O(|r|)")
+namedcm=ConstraintModel({},{},[('a',4,'irreflexive'),('a',4,'functional')],[],[])
+assert(sorted( f.name for rst,ct,f in namedcm.intra )==['functional','irreflexive'])
+assert(list(namedcm.violations17(test1,test8))==[ (('a',4),irreflexive) ])
+assert(pickle.loads(pickle.dumps(total,2)) is total and str(namedcm.intra).count('irreflexive')==1)
+
 exit()
 
 # Test Cases for Role Groups
@@ -8,6 +8,7 @@ __copyright__ = "Copyright 2019"
 __license__ = "MIT"
 __version__ = "1.0.0"
 
+import multiprocessing
 import sys
 
 sys.path.append('../')
@@ -37,39 +38,47 @@ class PersistenceAnnotation:
 		Returns a String representation of the persistence annotation.
 		'''
 		return 'PersistenceAnnotation({0},{1},{2},{3})'.format(self.nt,self.rt,self.ct,self.rel)
+
+	def key(self):
+		'''
+		Returns the content of the persistence annotation as hashable key.
+		'''
+		return (self.nt,self.rt,self.ct,self.rel)
 	
-	def compute_fills(self,crom,constraintmodel,ext):
+	def compute_fills(self,crom,constraintmodel,ext,index=None):
+		'''
+		Computes the persisted fills by semi-naive evaluation, i.e., the inductive cases are only applied to the
+		fills derived in the previous round, by means of the given (or a newly created) FillsIndex.
+		'''
+		if index is None:
+			index=FillsIndex(crom,constraintmodel,ext)
 		result=set()
 		#CTSel
-		result.update( [(t,ctp,rt) for ctp in self.ct for (t,ct,rt) in crom.fills if ctp==ct] )
+		for ctp in self.ct:
+			result.update(crom.fills_by_ct.get(ctp,()))
 		#RTSel
-		result.update( [(t,ct,rtp) for rtp in self.rt for (t,ct,rt) in crom.fills if rtp==rt] )
-		#RSTSelLeft
-		result.update( [(t,ctp,rt) for (rstp,ctp) in self.rel for (t,ct,rt) in crom.fills if ctp==ct and crom.rel[(rstp,ctp)][0]==rt ] )
-		#RSTSelRight
-		result.update( [(t,ctp,rt) for (rstp,ctp) in self.rel for (t,ct,rt) in crom.fills if ctp==ct and  crom.rel[(rstp,ctp)][1]==rt ] )
+		for rtp in self.rt:
+			result.update(crom.fills_by_rt.get(rtp,()))
+		#RSTSelLeft and RSTSelRight
+		for (rstp,ctp) in self.rel:
+			for rt in crom.rel[(rstp,ctp)]:
+				result.update(crom.fills_by_ctrt.get((ctp,rt),()))
 		#inductive cases
-		oldsize=-1
-		while oldsize<len(result):
-			oldsize=len(result)
-			#CTExt
-			result.update( [ (t,ct1,rt) for (ct1,ct2,_) in result if ct1 in crom.ct \
-			for (t,ct,rt) in crom.fills if ct1==ct and rt in ext[ct1] ] )
-			#OccurExt
-			result.update( [ (t,ct,rt) for (_,ct1,_) in result \
-			for (t,ct,rt) in crom.fills if ct1==ct and rt in ext[ct1] ] )
-			#RelExtLeft
-			result.update( [ (t,ct,rt2) for (s,ct1,rt1) in result \
-			for (t,ct,rt2) in crom.fills if ct1==ct \
-			for (rst,ct2) in constraintmodel.card.iterkeys() \
-			if ct2==ct and crom.rel[(rst,ct)][0]==rt1 and crom.rel[(rst,ct)][1]==rt2 and \
-			constraintmodel.card[(rst,ct)][1][0]>=1 ] )
-			#RelExtRight
-			result.update( [ (s,ct,rt1) for (t,ct1,rt2) in result \
-			for (s,ct,rt1) in crom.fills if ct1==ct \
-			for (rst,ct2) in constraintmodel.card.iterkeys() \
-			if ct2==ct and crom.rel[(rst,ct)][0]==rt1 and crom.rel[(rst,ct)][1]==rt2 and \
-			constraintmodel.card[(rst,ct)][0][0]>=1 ] )
+		delta=set(result)
+		while delta:
+			derived=set()
+			for (t,ct,rt) in delta:
+				#CTExt
+				if t in crom.ct:
+					derived.update(index.ext.get(t,()))
+				#OccurExt
+				derived.update(index.ext.get(ct,()))
+				#RelExtLeft
+				derived.update(index.left.get((ct,rt),()))
+				#RelExtRight
+				derived.update(index.right.get((ct,rt),()))
+			delta=derived-result
+			result.update(delta)
 		return result
 	
 	def compute_rel(self,crom,constraintmodel,fills):
@@ -81,18 +90,14 @@ class PersistenceAnnotation:
 		for (rst,ct) in crom.rel.iterkeys():
 			if ct in self.ct:
 				result[(rst,ct)]=crom.rel[(rst,ct)]
-		#inductive case
-		oldsize=-1
-		while oldsize<len(result):
-			oldsize=len(result)
-			#RelExt
-			ext=[ (rst,ct) for (rst,ct) in constraintmodel.card \
-			for (s,ct1,rt1) in fills if ct1==ct \
-			for (t,ct2,rt2) in fills if ct2==ct and \
-			crom.rel[(rst,ct)][0]==rt1 and crom.rel[(rst,ct)][1]==rt2 and \
-			(constraintmodel.card[(rst,ct)][0][0]>=1 or constraintmodel.card[(rst,ct)][1][0]>=1) ]
-			for (rst,ct) in ext:
-				result[(rst,ct)]=crom.rel[(rst,ct)]
+		#inductive case (a single pass suffices, as the fills are not extended)
+		filled=set( (ct,rt) for (t,ct,rt) in fills )
+		#RelExt
+		for (rst,ct) in constraintmodel.card:
+			(rt1,rt2)=crom.rel[(rst,ct)]
+			if (ct,rt1) in filled and (ct,rt2) in filled and \
+			(constraintmodel.card[(rst,ct)][0][0]>=1 or constraintmodel.card[(rst,ct)][1][0]>=1):
+				result[(rst,ct)]=(rt1,rt2)
 		return result
 	
 	def compute_occur(self,constraintmodel,fills,rel):
@@ -113,6 +118,28 @@ class PersistenceAnnotation:
 				result[(rst,ct)]=constraintmodel.card[(rst,ct)]
 		return result
 
+class FillsIndex:
+	'''
+	Class representation of the fills indexes used by the inductive cases of the persisted fills.
+	'''
+
+	def __init__(self,crom,constraintmodel,ext):
+		'''
+		Creates the indexes mapping a compartment type to its fills with role types in ext (CTExt, OccurExt),
+		and a pair (ct,rt) to the fills of the opposite role types of mandatory relationships (RelExtLeft, RelExtRight).
+		'''
+		self.ext=dict()
+		for ct in crom.ct:
+			self.ext[ct]=set( (t,ct_1,rt) for (t,ct_1,rt) in crom.fills_by_ct.get(ct,()) if rt in ext[ct] )
+		self.left=dict()
+		self.right=dict()
+		for (rst,ct) in constraintmodel.card.iterkeys():
+			(rt1,rt2)=crom.rel[(rst,ct)]
+			if constraintmodel.card[(rst,ct)][1][0]>=1:
+				self.left.setdefault((ct,rt1),set()).update(crom.fills_by_ctrt.get((ct,rt2),()))
+			if constraintmodel.card[(rst,ct)][0][0]>=1:
+				self.right.setdefault((ct,rt2),set()).update(crom.fills_by_ctrt.get((ct,rt1),()))
+
 def compute_ext(crom,constraintmodel):
 	result=dict()
 	for ct in crom.ct:
@@ -124,8 +151,14 @@ def transformation(crom,constraintmodel,annotation):
 	assert constraintmodel.compliant(crom)
 	#precompute ext
 	ext=compute_ext(crom,constraintmodel)
+	return persist(crom,constraintmodel,annotation,ext,FillsIndex(crom,constraintmodel,ext))
+
+def persist(crom,constraintmodel,annotation,ext,index):
+	'''
+	Returns the persisted CROM and Constraint Model for the given annotation from the precomputed ext and fills indexes.
+	'''
 	#compute fills
-	fills=annotation.compute_fills(crom,constraintmodel,ext)
+	fills=annotation.compute_fills(crom,constraintmodel,ext,index)
 	#compute rel
 	rel=annotation.compute_rel(crom,constraintmodel,fills)
 	#initialize sets
@@ -143,25 +176,129 @@ def transformation(crom,constraintmodel,annotation):
 	pcm=  ConstraintModel(occur,card,[],{},[])
 	return (pcrom,pcm)
 
-def restriction(pcrom,croi):
-	#Rule 36
-	plays=set( [(o,c,r) for (o,c,r) in croi.plays \
-	if (croi.type1[o],croi.type1[c],croi.type1[r]) in pcrom.fills] )
-	#Rule 37
-	links=dict()
-	for (rst,c) in croi.links.iterkeys():
-		ct=croi.type1[c]
-		if (rst,ct) in pcrom.rel:  		
-			links[(rst,c)]=set( [(r1,r2) for (r1,r2) in croi.links[(rst,c)] \
-			if pcrom.rel[(rst,ct)][0]==croi.type1[r1] and pcrom.rel[(rst,ct)][1]==croi.type1[r2] ])
-	#construction of the sets
-	ns=set( [n for (n,c,r) in plays if croi.type1[n] in pcrom.nt] )
-	rs=set( [r for (n,c,r) in plays] )
-	cs=set( [n for (n,c,r) in plays if croi.type1[n] in pcrom.ct] ) | set( [c for (n,c,r) in plays] )
-	type1=dict(croi.type1)
-	#Restricted CROI
-	result=CROI(ns,rs,cs,type1,plays,links)
-	return result
+class BatchTransformation:
+	'''
+	Class representation of the persistence transformation of a CROM and Constraint Model for many persistence annotations.
+	'''
+
+	def __init__(self,crom,constraintmodel):
+		'''
+		Creates a new BatchTransformation validating the given CROM and Constraint Model and precomputing ext and the fills indexes once.
+		'''
+		assert crom.wellformed()
+		assert constraintmodel.compliant(crom)
+		self.crom=crom
+		self.constraintmodel=constraintmodel
+		self.ext=compute_ext(crom,constraintmodel)
+		self.index=FillsIndex(crom,constraintmodel,self.ext)
+		self.results=dict()
+
+	def transformation(self,annotation):
+		'''
+		Returns the persisted CROM and Constraint Model for the given annotation, memoized by the content of the annotation.
+		'''
+		key=annotation.key()
+		if key not in self.results:
+			self.results[key]=persist(self.crom,self.constraintmodel,annotation,self.ext,self.index)
+		return self.results[key]
+
+	def transformations(self,annotations,processes=None):
+		'''
+		Returns the persisted CROMs and Constraint Models for the given annotations. If processes is given,
+		the annotations without memoized result are transformed by a pool of processes sharing this BatchTransformation by forking.
+		'''
+		global _batch
+		annotations=list(annotations)
+		pending=dict( (a.key(),a) for a in annotations if a.key() not in self.results )
+		if processes and len(pending)>1:
+			_batch=self
+			pool=multiprocessing.Pool(processes)
+			try:
+				self.results.update(zip(pending.keys(),pool.map(_persist,pending.values())))
+			finally:
+				pool.terminate()
+				pool.join()
+				_batch=None
+		return [ self.transformation(a) for a in annotations ]
+
+_batch=None
+
+def _persist(annotation):
+	return persist(_batch.crom,_batch.constraintmodel,annotation,_batch.ext,_batch.index)
+
+class CROISink:
+	'''
+	Class representation of a sink collecting the restricted plays and links streamed by stream_restriction.
+	Other sinks, e.g., writing to a file or database, only need to provide add_plays and add_links.
+	'''
+
+	def __init__(self):
+		'''
+		Creates a new empty CROISink.
+		'''
+		self.plays=set()
+		self.links=dict()
+
+	def add_plays(self,chunk):
+		'''
+		Adds the given chunk of restricted plays.
+		'''
+		self.plays.update(chunk)
 
+	def add_links(self,key,chunk):
+		'''
+		Adds the given chunk of restricted links to links(key).
+		'''
+		self.links.setdefault(key,set()).update(chunk)
 
+	def croi(self,pcrom,type1):
+		'''
+		Returns the restricted CROI of the collected plays and links with the given (restricted) type mapping.
+		'''
+		ns=set( [n for (n,c,r) in self.plays if type1[n] in pcrom.nt] )
+		rs=set( [r for (n,c,r) in self.plays] )
+		cs=set( [n for (n,c,r) in self.plays if type1[n] in pcrom.ct] ) | set( [c for (n,c,r) in self.plays] )
+		return CROI(ns,rs,cs,type1,self.plays,self.links)
 
+def stream_restriction(pcrom,type1,plays,links,sink,chunksize=10000):
+	'''
+	Streams the restriction of a CROI to the persisted CROM into the sink, where the plays are given as an iterable of (o,c,r),
+	the links as an iterable of ((rst,c),[(r1,r2),...]), and type1 as a mapping supporting lookups.
+	The restricted plays and links are emitted in chunks of at most chunksize entries.
+	Returns the type mapping restricted to the instances referenced by the emitted plays and links.
+	'''
+	types=dict()
+	#Rule 36
+	chunk=[]
+	for (o,c,r) in plays:
+		if (type1[o],type1[c],type1[r]) in pcrom.fills:
+			chunk.append((o,c,r))
+			for x in (o,c,r):
+				types[x]=type1[x]
+			if len(chunk)>=chunksize:
+				sink.add_plays(chunk)
+				chunk=[]
+	if chunk:
+		sink.add_plays(chunk)
+	#Rule 37
+	for ((rst,c),pairs) in links:
+		ct=type1[c]
+		if (rst,ct) in pcrom.rel:
+			types[c]=ct
+			chunk=[]
+			for (r1,r2) in pairs:
+				if pcrom.rel[(rst,ct)][0]==type1[r1] and pcrom.rel[(rst,ct)][1]==type1[r2]:
+					chunk.append((r1,r2))
+					types[r1]=type1[r1]
+					types[r2]=type1[r2]
+					if len(chunk)>=chunksize:
+						sink.add_links((rst,c),chunk)
+						chunk=[]
+			sink.add_links((rst,c),chunk)
+	return types
+
+def restriction(pcrom,croi):
+	sink=CROISink()
+	type1=stream_restriction(pcrom,croi.type1,croi.plays,croi.links.iteritems(),sink)
+	#Restricted CROI
+	return sink.croi(pcrom,type1)
@@ -30,6 +30,11 @@ def testtheorems(pannotation,fmodel,fcm):
 	assert pcm.compliant(pmodel)
 	#Theorem 2
 	pinstance=restriction(pmodel,finstance)
+	sink=CROISink()
+	ptype1=stream_restriction(pmodel,finstance.type1,iter(finstance.plays),finstance.links.iteritems(),sink,1)
+	sinstance=sink.croi(pmodel,ptype1)
+	assert sinstance.plays==pinstance.plays and sinstance.links==pinstance.links
+	assert set( ptype1.iterkeys() ) <= set( finstance.type1.iterkeys() )
 	print "  Test restricted CROI compliance to persisted CROM"
 	assert pinstance.compliant(pmodel)
 	print "  Test restricted CROI validity to persisted Constraint Model"
@@ -105,4 +110,14 @@ for nt,rt,ct,rel in set(itertools.product(fmodel.nt,fmodel.rt,fmodel.ct,set(fmod
 	pannotation=PersistenceAnnotation(fmodel,[nt],[rt],[ct],[rel])
 	testtheorems(pannotation,fmodel,fcm)
 
+print "Test Batch Transformations"
+
+batch=BatchTransformation(fmodel,fcm)
+pannotations+=[ PersistenceAnnotation(fmodel,[nt],[rt],[ct],[rel]) \
+for nt,rt,ct,rel in set(itertools.product(fmodel.nt,fmodel.rt,fmodel.ct,set(fmodel.rel.iterkeys()))) ]
+for pannotation,(pmodel,pcm) in zip(pannotations,batch.transformations(pannotations,2)):
+	qmodel,qcm = transformation(fmodel,fcm,pannotation)
+	assert pmodel.fills==qmodel.fills and pmodel.rel==qmodel.rel and pcm.rolec==qcm.rolec and pcm.card==qcm.card
+	assert batch.transformation(PersistenceAnnotation(fmodel,pannotation.nt,pannotation.rt,pannotation.ct,pannotation.rel))[0] is pmodel
+
 print "All Tests passed successfully"